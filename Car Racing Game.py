@@ -1,23 +1,99 @@
+import time
+PROCESS_START = time.perf_counter()  # Taken before the imports, for the time-to-first-frame report
+import os
+import csv
+import json
+import importlib
+import importlib.util
 import pygame
-import cv2
 import numpy as np
 import random
 import math
-import time
+import argparse
+import queue
+import sqlite3
+import struct
+import zlib
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from pygame import gfxdraw
 
-# Initialize Pygame
-pygame.init()
+class LazyModule:
+    """Stands in for a module and imports it on first use, so startup doesn't pay for it."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# OpenCV is only needed once the tracker thread opens the camera
+cv2 = LazyModule("cv2")
+# Only needed to share a leaderboard, see LeaderboardClient
+requests = LazyModule("requests")
+requests_adapters = LazyModule("requests.adapters")
+urllib3_retry = LazyModule("urllib3.util.retry")
+
+# Initialize only the parts of Pygame the game uses; audio and joysticks can be slow to start.
+# The display is opened by CarRacingGame, so headless runs and batch workers never need a video device.
+pygame.font.init()
 
 # Constants
 SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = 800
-FPS = 60
+FPS = 60  # Render cap, 0 for uncapped
+SIM_HZ = 60  # Simulation steps per second, independent of the render rate
+SIM_DT = 1.0 / SIM_HZ
+MAX_CATCHUP_STEPS = 5  # Most simulation steps run in one frame before the backlog is dropped
 ROAD_WIDTH = 400
 LANE_WIDTH = ROAD_WIDTH // 3
 CAR_WIDTH = 60
 CAR_HEIGHT = 100
 FINISH_LINE_DISTANCE = 5000
+COURSE_CHUNK_LENGTH = 1200  # Course is generated in chunks of this many pixels
+COURSE_LOOKAHEAD = 200  # Generate the next chunk once it's this close to the top of the screen
+PIXELS_PER_METER = 10  # Only used to report distances in race statistics
+
+# Gameplay constants that batch simulations can override per run
+DEFAULT_TUNING = {
+    "max_speed": 8.0,
+    "min_speed": 1.0,
+    "steer_sensitivity": 7.0,  # Pixels per step at full head tilt
+    "speed_sensitivity": 0.5,  # Speed change per step at full head tilt
+    "hurdle_spacing": 400,  # Pixels of course per hurdle
+}
+ASYNC_HEAD_TRACKING = True  # Capture and detect on a background thread
+ADAPTIVE_QUALITY = True  # Let QualityGovernor lower quality to hold the frame rate
+# Levels QualityGovernor steps through, full quality first; each gives up the next least noticeable thing
+QUALITY_LEVELS = (
+    {"hud_interval": 1, "detect_interval": 1, "scenery_density": 1.0, "render_scale": 1.0, "particles": 1.0},
+    {"hud_interval": 6, "detect_interval": 1, "scenery_density": 1.0, "render_scale": 1.0, "particles": 1.0},
+    {"hud_interval": 6, "detect_interval": 2, "scenery_density": 1.0, "render_scale": 1.0, "particles": 1.0},
+    {"hud_interval": 6, "detect_interval": 2, "scenery_density": 0.5, "render_scale": 1.0, "particles": 0.5},
+    {"hud_interval": 6, "detect_interval": 2, "scenery_density": 0.5, "render_scale": 0.75, "particles": 0.5},
+    {"hud_interval": 6, "detect_interval": 3, "scenery_density": 0.25, "render_scale": 0.5, "particles": 0.25},
+)
+TRACKING_MODE = "roi"  # "roi" (detect-then-track) or "full" (full-frame cascade every frame)
+SMOOTHING_FILTER = "one_euro"  # See FILTERS
+MAX_PREDICTION = 0.1  # Seconds a filter may extrapolate past its last sample
+CALIBRATION_PATH = os.path.join(os.path.expanduser("~"), ".head_racing", "calibration.json")
+RESULTS_PATH = os.path.join(os.path.expanduser("~"), ".head_racing", "results.sqlite")
+LEADERBOARD_SIZE = 5  # Entries shown on the start and finish screens
+UPLOAD_SPOOL_PATH = os.path.join(os.path.expanduser("~"), ".head_racing", "upload_spool.jsonl")
+BASELINE_ADAPT_RATE = 0.02  # How fast the baseline follows the head while it's held neutral
+NEUTRAL_THRESHOLD = 0.15  # Movement below this on both axes counts as neutral
+MAX_SAMPLE_AGE = 0.5  # Seconds before a tracker sample is treated as stale
+PARTICLE_CAPACITY = 5000  # Most particles one ParticleSystem holds, sized so an update and draw fit a 60 FPS frame
+PARTICLE_SWAY_HZ = 1.5  # How fast particles swing side to side
+CELEBRATION_BALLOONS = 150
+CELEBRATION_CONFETTI = 2000
+EXHAUST_RATE = 120  # Dust particles per second behind the car at top speed
+REPLAY_SNAPSHOT_INTERVAL = 300  # Steps between replay state snapshots, bounds how far a seek replays
 
 # Colors
 WHITE = (255, 255, 255)
@@ -32,182 +108,2063 @@ BLUE = (0, 0, 255)
 DARK_GREEN = (0, 100, 0)
 TREE_GREEN = (34, 139, 34)
 HOUSE_COLOR = (160, 82, 45)
+ORANGE = (230, 130, 0)
+CELEBRATION_COLORS = [RED, BLUE, GREEN, YELLOW, (255, 0, 255), (255, 165, 0)]
+
+# How InputSource.status() and the course's readiness are shown
+STATUS_LABELS = {"starting": "Starting...", "ready": "Ready", "unavailable": "Not found"}
+STATUS_COLORS = {"starting": ORANGE, "ready": DARK_GREEN, "unavailable": RED}
+
+class CaptureProfile:
+    """Camera settings plus the scale the face cascade runs at."""
+    def __init__(self, width=640, height=480, fps=30, buffer_size=1, detect_scale=0.5):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size  # Small buffers keep frames fresh
+        self.detect_scale = detect_scale  # Fraction of capture size fed to the cascade
+    
+    def apply(self, cap):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        cap.set(cv2.CAP_PROP_FPS, self.fps)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
 
-class HeadTracker:
+DEFAULT_CAPTURE_PROFILE = CaptureProfile()
+LOW_POWER_CAPTURE_PROFILE = CaptureProfile(width=320, height=240, fps=30, detect_scale=1.0)
+CAPTURE_PROFILES = {
+    "default": DEFAULT_CAPTURE_PROFILE,
+    "low": LOW_POWER_CAPTURE_PROFILE,  # Quarter the pixels, for laptops where tracking eats the frame budget
+}
+
+class MovementFilter:
+    """Smooths (horizontal, vertical) tracker samples taken at timestamps in seconds.
+    
+    predict(t) extrapolates the filtered movement to time t using the
+    filter's velocity estimate, so steering can be read at render time
+    rather than at the (older) capture time. The state is replaced as one
+    tuple, so another thread can call predict() while update() runs.
+    """
     def __init__(self):
-        self.cap = cv2.VideoCapture(0)
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self._state = None  # (timestamp, values, velocities)
+    
+    def reset(self):
+        self._state = None
+    
+    def update(self, timestamp, movement):
+        raise NotImplementedError
+    
+    def predict(self, timestamp):
+        state = self._state
+        if state is None:
+            return 0, 0
+        last, values, velocities = state
+        ahead = max(0.0, min(MAX_PREDICTION, timestamp - last))
+        return tuple(max(-1, min(1, value + velocity * ahead)) for value, velocity in zip(values, velocities))
+
+class PassthroughFilter(MovementFilter):
+    """No smoothing, for recording raw traces."""
+    def update(self, timestamp, movement):
+        self._state = (timestamp, tuple(movement), (0.0, 0.0))
+        return tuple(movement)
+
+class MovingAverageFilter(MovementFilter):
+    """Average of the last window samples, the original smoothing. Doesn't predict."""
+    def __init__(self, window=5):
+        super().__init__()
+        self.window = window
+        self.samples = deque(maxlen=window)
+    
+    def reset(self):
+        super().reset()
+        self.samples.clear()
+    
+    def update(self, timestamp, movement):
+        self.samples.append(tuple(movement))
+        if len(self.samples) >= 3:
+            values = tuple(sum(axis) / len(self.samples) for axis in zip(*self.samples))
+        else:
+            values = tuple(movement)
+        self._state = (timestamp, values, (0.0, 0.0))
+        return values
+
+class OneEuroFilter(MovementFilter):
+    """One Euro filter: heavy smoothing when the head is still, little lag when it moves fast."""
+    def __init__(self, min_cutoff=1.5, beta=0.5, derivative_cutoff=1.0):
+        super().__init__()
+        self.min_cutoff = min_cutoff  # Hz
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff  # Hz
+    
+    @staticmethod
+    def smoothing(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+    
+    def update(self, timestamp, movement):
+        state = self._state
+        if state is None:
+            values = tuple(movement)
+            self._state = (timestamp, values, (0.0, 0.0))
+            return values
+        last, previous, velocities = state
+        dt = max(timestamp - last, 1e-3)
+        new_values = []
+        new_velocities = []
+        for value, prior, velocity in zip(movement, previous, velocities):
+            a = self.smoothing(self.derivative_cutoff, dt)
+            velocity = velocity + a * ((value - prior) / dt - velocity)
+            a = self.smoothing(self.min_cutoff + self.beta * abs(velocity), dt)
+            new_values.append(prior + a * (value - prior))
+            new_velocities.append(velocity)
+        values = tuple(new_values)
+        self._state = (timestamp, values, tuple(new_velocities))
+        return values
+
+class KalmanFilter(MovementFilter):
+    """Constant-velocity Kalman filter, one independent position/velocity model per axis."""
+    def __init__(self, process_noise=50.0, measurement_noise=0.01):
+        super().__init__()
+        self.process_noise = process_noise  # Acceleration variance
+        self.measurement_noise = measurement_noise
+        self.covariances = None
+    
+    def reset(self):
+        super().reset()
+        self.covariances = None
+    
+    def update(self, timestamp, movement):
+        state = self._state
+        if state is None:
+            values = tuple(movement)
+            self._state = (timestamp, values, (0.0, 0.0))
+            self.covariances = [(1.0, 0.0, 1.0) for _ in values]
+            return values
+        last, previous, velocities = state
+        dt = max(timestamp - last, 1e-3)
+        q = self.process_noise
+        new_values = []
+        new_velocities = []
+        new_covariances = []
+        for measured, position, velocity, (p00, p01, p11) in zip(movement, previous, velocities, self.covariances):
+            # Predict
+            position += velocity * dt
+            p00 += dt * (2 * p01 + dt * p11) + q * dt ** 4 / 4
+            p01 += dt * p11 + q * dt ** 3 / 2
+            p11 += q * dt ** 2
+            # Update with the measured position
+            gain_denominator = p00 + self.measurement_noise
+            k0 = p00 / gain_denominator
+            k1 = p01 / gain_denominator
+            residual = measured - position
+            position += k0 * residual
+            velocity += k1 * residual
+            p00, p01, p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+            new_values.append(position)
+            new_velocities.append(velocity)
+            new_covariances.append((p00, p01, p11))
+        values = tuple(new_values)
+        self.covariances = new_covariances
+        self._state = (timestamp, values, tuple(new_velocities))
+        return values
+
+FILTERS = {
+    "none": PassthroughFilter,
+    "moving_average": MovingAverageFilter,
+    "one_euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+}
+
+class InputSource:
+    """Anything update_game can read (horizontal, vertical) movement from.
+    
+    Sources are bound to the game before the race so time-based and
+    policy-driven sources can read the game clock and state.
+    """
+    calibration_frames = 0
+    frame_count = 0
+    game = None
+    
+    def bind(self, game):
+        self.game = game
+    
+    def get_head_movement(self):
+        raise NotImplementedError
+    
+    def calibration(self):
+        """Calibration worth saving for the current player, or None."""
+        return None
+    
+    def apply_calibration(self, calibration):
+        pass
+    
+    def recalibrate(self):
+        pass
+    
+    def status(self):
+        """"starting" while the source is still being opened, "unavailable" if it failed, else "ready"."""
+        return "ready"
+    
+    def set_detection_interval(self, interval):
+        """Run face detection on every interval-th camera frame only; sources without a camera ignore it."""
+        pass
+    
+    def latency_report(self):
+        """Per-stage StageTimer snapshots of the capture pipeline; empty for sources without a camera."""
+        return {}
+    
+    def release(self):
+        pass
+
+class CalibrationStore:
+    """Per-player calibration profiles in a small JSON file."""
+    def __init__(self, path=CALIBRATION_PATH):
+        self.path = path
+        self.profiles = {}
+        try:
+            with open(path) as f:
+                self.profiles = json.load(f)
+        except (OSError, ValueError):
+            pass  # No profiles yet, or an unreadable file we'll overwrite
+    
+    def load(self, player_name):
+        return self.profiles.get(player_name)
+    
+    def save(self, player_name, calibration):
+        if not player_name or calibration is None:
+            return
+        self.profiles[player_name] = calibration
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump(self.profiles, f, indent=2)
+        except OSError as e:
+            print(f"Could not save calibration: {e}")
+
+class ResultsStore:
+    """Race history in SQLite, written from a background thread.
+    
+    The writer thread owns the database connection. It keeps the
+    leaderboard and every player's best time in memory, so the game can
+    read them every frame without touching the disk.
+    """
+    def __init__(self, path=RESULTS_PATH, leaderboard_size=LEADERBOARD_SIZE):
+        self.path = path
+        self.leaderboard_size = leaderboard_size
+        self._lock = threading.Lock()
+        self._leaderboard = []  # (player, best time) pairs, fastest first
+        self._bests = {}  # player -> best finished time
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="ResultsStore", daemon=True)
+        self._thread.start()
+    
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE IF NOT EXISTS races (id INTEGER PRIMARY KEY, player TEXT NOT NULL, "
+                   "seed INTEGER, race_time REAL, distance REAL, collisions INTEGER, finished INTEGER, "
+                   "avg_fps REAL, recorded_at REAL)")
+        # Leaderboard and personal-best queries only ever read finished races by time
+        db.execute("CREATE INDEX IF NOT EXISTS races_by_player ON races (finished, player, race_time)")
+        db.commit()
+        return db
+    
+    def _worker(self):
+        try:
+            db = self._connect()
+            self._refresh(db)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Could not open race results: {e}")
+            db = None
+        while True:
+            race = self._queue.get()
+            if race is None:
+                break
+            if db is None:
+                continue
+            try:
+                db.execute("INSERT INTO races (player, seed, race_time, distance, collisions, finished, avg_fps, "
+                           "recorded_at) VALUES (:player, :seed, :race_time, :distance, :collisions, :finished, "
+                           ":avg_fps, :recorded_at)", race)
+                db.commit()
+                if race["finished"]:
+                    self._refresh(db)
+            except sqlite3.Error as e:
+                print(f"Could not save race result: {e}")
+        if db is not None:
+            db.close()
+    
+    def _refresh(self, db):
+        bests = dict(db.execute("SELECT player, MIN(race_time) FROM races WHERE finished = 1 GROUP BY player"))
+        leaderboard = sorted(bests.items(), key=lambda entry: entry[1])[:self.leaderboard_size]
+        with self._lock:
+            self._bests = bests
+            self._leaderboard = leaderboard
+    
+    def record(self, race):
+        """Queue one race dict (see CarRacingGame.record_race) for writing. Never blocks."""
+        self._queue.put(race)
+    
+    def leaderboard(self):
+        with self._lock:
+            return list(self._leaderboard)
+    
+    def best(self, player):
+        with self._lock:
+            return self._bests.get(player)
+    
+    def history(self, player=None, limit=20):
+        """Most recent races, newest first, read on the caller's thread. Not for use from the game loop."""
+        # The writer thread creates the database, which may not have happened yet
+        if not os.path.exists(self.path):
+            return []
+        db = sqlite3.connect(self.path)
+        try:
+            if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'races'").fetchone() is None:
+                return []
+            db.row_factory = sqlite3.Row
+            if player is None:
+                rows = db.execute("SELECT * FROM races ORDER BY id DESC LIMIT ?", (limit,))
+            else:
+                rows = db.execute("SELECT * FROM races WHERE player = ? ORDER BY id DESC LIMIT ?", (player, limit))
+            return [dict(row) for row in rows]
+        finally:
+            db.close()
+    
+    def close(self):
+        """Write everything still queued and stop the writer."""
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+class LeaderboardClient:
+    """Uploads races to a shared leaderboard service (leaderboard_service.py) from a background thread.
+    
+    Races are posted in batches over one pooled session, retrying transient
+    failures. While the service is unreachable they are spooled to disk and
+    sent once it's back, even after a restart. The shared leaderboard is
+    fetched on the same thread, so the network never touches frame time.
+    """
+    def __init__(self, url, spool_path=UPLOAD_SPOOL_PATH, batch_size=50, flush_interval=2.0,
+                 refresh_interval=15.0, timeout=5.0):
+        if importlib.util.find_spec("requests") is None:
+            raise RuntimeError("Sharing a leaderboard needs the requests package")
+        self.url = url.rstrip("/")
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Races carry ids the service deduplicates on, so retrying a POST is safe
+        retry = urllib3_retry.Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504), allowed_methods=None)
+        adapter = requests_adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._leaderboard = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="LeaderboardClient", daemon=True)
+        self._thread.start()
+    
+    def submit(self, race):
+        """Queue one race for upload. Never blocks."""
+        self._queue.put(race)
+    
+    def leaderboard(self):
+        """Last fetched [(player, best time)], or None until a fetch has succeeded."""
+        with self._lock:
+            return self._leaderboard
+    
+    def _worker(self):
+        pending = self._load_spool()
+        failures = 0
+        next_attempt = 0.0
+        next_refresh = 0.0
+        stopping = False
+        while not stopping:
+            try:
+                race = self._queue.get(timeout=self.flush_interval)
+                # Everything already queued goes out in the same batch
+                while race is not None:
+                    pending.append(race)
+                    race = self._queue.get_nowait()
+                stopping = True
+            except queue.Empty:
+                pass
+            
+            now = time.monotonic()
+            if pending and (stopping or now >= next_attempt):
+                if stopping:
+                    self._save_spool(pending)  # In case the upload outlives close()
+                pending = self._upload(pending)
+                if pending:
+                    failures += 1
+                    next_attempt = now + min(60.0, self.flush_interval * 2 ** failures)  # Back off while offline
+                else:
+                    failures = 0
+                    next_refresh = now  # Show the new times right away
+                self._save_spool(pending)
+            
+            if not stopping and failures == 0 and now >= next_refresh:
+                self._refresh()
+                next_refresh = now + self.refresh_interval
+        self.session.close()
+    
+    def _upload(self, pending):
+        """Post pending races in batches, returning the ones that couldn't be sent."""
+        while pending:
+            batch = pending[:self.batch_size]
+            try:
+                response = self.session.post(f"{self.url}/races", json=batch, timeout=self.timeout)
+            except requests.RequestException:
+                return pending
+            if 400 <= response.status_code < 500:
+                # The service will never take these, so don't keep resending them
+                print(f"Leaderboard rejected {len(batch)} races: {response.text.strip()}")
+            elif not response.ok:
+                return pending
+            pending = pending[len(batch):]
+        return pending
+    
+    def _refresh(self):
+        try:
+            response = self.session.get(f"{self.url}/leaderboard", params={"limit": LEADERBOARD_SIZE},
+                                        timeout=self.timeout)
+            response.raise_for_status()
+            entries = [(entry["player"], entry["race_time"]) for entry in response.json()["leaderboard"]]
+        except (requests.RequestException, ValueError, KeyError):
+            return  # Keep showing the last board we had
+        with self._lock:
+            self._leaderboard = entries
+    
+    def _load_spool(self):
+        try:
+            with open(self.spool_path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+    
+    def _save_spool(self, pending):
+        try:
+            if pending:
+                os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+                with open(self.spool_path, "w") as f:
+                    f.writelines(json.dumps(race) + "\n" for race in pending)
+            elif os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+        except OSError as e:
+            print(f"Could not spool leaderboard uploads: {e}")
+    
+    def close(self):
+        """Try to send what's left, spooling anything that doesn't go."""
+        self._queue.put(None)
+        self._thread.join(timeout=self.timeout)
+
+class FaceController(InputSource):
+    """Turns one face's position into (horizontal, vertical) movement.
+    
+    Holds the calibration, baseline drift and smoothing state for one face,
+    so several players sharing a camera can each have their own.
+    """
+    calibration_frames = 50
+    
+    def __init__(self, smoothing=SMOOTHING_FILTER):
         self.last_face_center = None
         self.baseline_face_size = None
         self.baseline_face_y = None
-        self.calibration_frames = 50
         self.frame_count = 0
         self.face_positions = []
-        self.movement_smoothing = []
-        self.smoothing_frames = 5
+        self.filter = FILTERS[smoothing]()
+        self.capture_time = 0.0  # When the frame being processed was read
+        self.frame_size = None
+        self.filtered = False  # Whether the last output came from the filter (and can be predicted)
+        self.pending_calibration = None  # Saved calibration waiting for the first frame's resolution
+    
+    def track_face(self, face, frame_size):
+        """Movement for a face box (x, y, w, h) in mirrored capture coordinates."""
+        x, y, w, h = face
+        self.frame_size = frame_size
+        if self.pending_calibration is not None:
+            calibration, self.pending_calibration = self.pending_calibration, None
+            self.apply_calibration(calibration)
+        
+        face_center_x = x + w // 2
+        face_center_y = y + h // 2
+        face_size = w * h
+        
+        # Calibration phase
+        if self.frame_count < self.calibration_frames:
+            self.face_positions.append((face_center_x, face_center_y, face_size))
+            self.frame_count += 1
+            if self.frame_count == self.calibration_frames:
+                # Calculate baseline
+                avg_x = sum(pos[0] for pos in self.face_positions) / len(self.face_positions)
+                avg_y = sum(pos[1] for pos in self.face_positions) / len(self.face_positions)
+                avg_size = sum(pos[2] for pos in self.face_positions) / len(self.face_positions)
+                self.last_face_center = (avg_x, avg_y)
+                self.baseline_face_size = avg_size
+                self.baseline_face_y = avg_y
+            return 0, 0
+        
+        if self.last_face_center and self.baseline_face_size and self.baseline_face_y:
+            # Calculate movement with enhanced sensitivity
+            dx = face_center_x - self.last_face_center[0]
+            dy = face_center_y - self.baseline_face_y
+            
+            # Size change for forward/backward movement (more sensitive)
+            size_ratio = face_size / self.baseline_face_size
+            size_change = size_ratio - 1.0
+            
+            # Enhanced sensitivity for horizontal movement
+            horizontal_movement = max(-1, min(1, dx / 30))  # More sensitive steering
+            
+            # Combine size change and y-movement for vertical control
+            y_movement = max(-1, min(1, -dy / 25))  # Head up/down (inverted)
+            size_movement = max(-1, min(1, size_change * 8))  # Face closer/farther
+            
+            # Use the stronger signal for vertical movement
+            if abs(size_movement) > abs(y_movement):
+                vertical_movement = size_movement
+            else:
+                vertical_movement = y_movement
+            
+            # While the head is held neutral, let the baseline follow slow posture drift
+            if abs(horizontal_movement) < NEUTRAL_THRESHOLD and abs(vertical_movement) < NEUTRAL_THRESHOLD:
+                self.adapt_baseline(face_center_x, face_center_y, face_size)
+            
+            # Apply smoothing
+            self.filtered = True
+            return self.filter.update(self.capture_time, (horizontal_movement, vertical_movement))
+        
+        return 0, 0
+    
+    def adapt_baseline(self, center_x, center_y, face_size, rate=BASELINE_ADAPT_RATE):
+        baseline_x, baseline_y = self.last_face_center
+        baseline_x += rate * (center_x - baseline_x)
+        baseline_y += rate * (center_y - baseline_y)
+        self.last_face_center = (baseline_x, baseline_y)
+        self.baseline_face_y = baseline_y
+        self.baseline_face_size += rate * (face_size - self.baseline_face_size)
+    
+    def calibration(self):
+        if self.frame_count < self.calibration_frames or self.frame_size is None:
+            return None
+        return {
+            "center": list(self.last_face_center),
+            "face_size": self.baseline_face_size,
+            "frame_size": list(self.frame_size),
+        }
+    
+    def apply_calibration(self, calibration):
+        """Start from a saved baseline instead of calibrating, if it was taken at this resolution."""
+        if self.frame_size is None:
+            # No frame seen yet, so the resolution check waits for the first tracked face
+            self.recalibrate()
+            self.pending_calibration = calibration
+            return
+        if list(self.frame_size) != calibration["frame_size"]:
+            self.recalibrate()
+            return
+        self.last_face_center = tuple(calibration["center"])
+        self.baseline_face_y = calibration["center"][1]
+        self.baseline_face_size = calibration["face_size"]
+        self.frame_count = self.calibration_frames
+        self.filter.reset()
+    
+    def recalibrate(self):
+        self.last_face_center = None
+        self.baseline_face_size = None
+        self.baseline_face_y = None
+        self.face_positions = []
+        self.frame_count = 0
+        self.pending_calibration = None
+        self.filter.reset()
+    
+class HeadTracker(FaceController):
+    def __init__(self, source=0, tracking_mode=TRACKING_MODE, profile=DEFAULT_CAPTURE_PROFILE,
+                 smoothing=SMOOTHING_FILTER):
+        super().__init__(smoothing)
+        self.cap = cv2.VideoCapture(source)
+        self.profile = profile
+        self.live = isinstance(source, int)
+        if self.live:
+            # Only live cameras take capture settings, video files play as recorded
+            profile.apply(self.cap)
+        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        
+        # Detect-then-track state
+        self.tracking_mode = tracking_mode
+        self.last_face_box = None
+        self.face_template = None
+        self.frames_since_detect = 0
+        self.roi_detect_interval = 5  # Re-run the cascade in the ROI every N frames
+        self.roi_padding = 0.5  # ROI grows by this fraction of the face size on each side
+        self.template_threshold = 0.6  # Minimum match score before falling back to detection
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.template_hits = 0
         
     def get_head_movement(self):
+        frame = self.read_frame()
+        if frame is None:
+            return 0, 0  # No movement if camera fails
+        return self.process_frame(frame)
+    
+    def read_frame(self):
         ret, frame = self.cap.read()
         if not ret:
-            return 0, 0  # No movement if camera fails
-        
-        frame = cv2.flip(frame, 1)  # Mirror the image
+            return None
+        # Recorded video is filtered on its own timeline, however fast it's read
+        self.capture_time = time.time() if self.live else self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        return frame
+    
+    def process_frame(self, frame):
+        self.filtered = False
+        face = self.locate_face(self.detection_image(frame))
+        if face is None:
+            return 0, 0
+        return self.track_face(self.capture_box(face, frame.shape[1]), (frame.shape[1], frame.shape[0]))
+    
+    def detection_image(self, frame):
+        """Grayscale frame at the size the cascade runs at."""
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(50, 50))
+        scale = self.profile.detect_scale
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return gray
+    
+    def capture_box(self, face, frame_width):
+        """Map a detection box back to capture coordinates and mirror it, instead of flipping the frame."""
+        x, y, w, h = (int(v / self.profile.detect_scale) for v in face)
+        return frame_width - (x + w), y, w, h
+    
+    def status(self):
+        return "ready" if self.cap.isOpened() else "unavailable"
+    
+    def face_size_limits(self):
+        """Cascade (minSize, maxSize) in detection pixels, derived from the calibrated face size."""
+        scale = self.profile.detect_scale
+        if not self.baseline_face_size:
+            min_side = max(24, int(50 * scale))
+            return (min_side, min_side), (0, 0)  # (0, 0) means no upper limit
+        side = math.sqrt(self.baseline_face_size) * scale
+        min_side = max(24, int(side * 0.6))
+        max_side = int(side * 1.6)
+        return (min_side, min_side), (max_side, max_side)
+    
+    def detect_all_faces(self, gray, offset=(0, 0)):
+        min_size, max_size = self.face_size_limits()
+        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=min_size, maxSize=max_size)
+        return [(int(x) + offset[0], int(y) + offset[1], int(w), int(h)) for x, y, w, h in faces]
+    
+    def detect_faces(self, gray, offset=(0, 0)):
+        faces = self.detect_all_faces(gray, offset)
+        if not faces:
+            return None
+        # Get the largest face (closest to camera)
+        return max(faces, key=lambda f: f[2] * f[3])
+    
+    def padded_roi(self, box, frame_shape):
+        x, y, w, h = box
+        pad_x = int(w * self.roi_padding)
+        pad_y = int(h * self.roi_padding)
+        x0 = max(0, x - pad_x)
+        y0 = max(0, y - pad_y)
+        x1 = min(frame_shape[1], x + w + pad_x)
+        y1 = min(frame_shape[0], y + h + pad_y)
+        return x0, y0, x1, y1
+    
+    def track_template(self, gray, roi):
+        x0, y0, x1, y1 = roi
+        template_h, template_w = self.face_template.shape
+        if x1 - x0 < template_w or y1 - y0 < template_h:
+            return None
+        result = cv2.matchTemplate(gray[y0:y1, x0:x1], self.face_template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (mx, my) = cv2.minMaxLoc(result)
+        if score < self.template_threshold:
+            return None
+        return (x0 + mx, y0 + my, template_w, template_h)
+    
+    def locate_face(self, gray):
+        """Find the face box, scanning the whole frame only when tracking is lost."""
+        if self.tracking_mode != "roi" or self.last_face_box is None:
+            face = self.detect_faces(gray)
+            self.full_scans += 1
+            self.frames_since_detect = 0
+        else:
+            roi = self.padded_roi(self.last_face_box, gray.shape)
+            face = None
+            if self.frames_since_detect < self.roi_detect_interval and self.face_template is not None:
+                face = self.track_template(gray, roi)
+                if face is not None:
+                    self.template_hits += 1
+                    self.frames_since_detect += 1
+            if face is None:
+                x0, y0, x1, y1 = roi
+                face = self.detect_faces(gray[y0:y1, x0:x1], offset=(x0, y0))
+                self.roi_scans += 1
+                if face is None:
+                    face = self.detect_faces(gray)
+                    self.full_scans += 1
+                if face is not None:
+                    self.frames_since_detect = 0
         
-        if len(faces) > 0:
-            # Get the largest face (closest to camera)
-            face = max(faces, key=lambda x: x[2] * x[3])
+        if face is None:
+            self.last_face_box = None
+            self.face_template = None
+            return None
+        
+        if self.tracking_mode == "roi" and self.frames_since_detect == 0:
             x, y, w, h = face
+            self.face_template = gray[y:y + h, x:x + w].copy()
+        self.last_face_box = face
+        return face
+    
+    def release(self):
+        self.cap.release()
+
+def benchmark_tracking_modes(video_path, modes=("full", "roi")):
+    """Compare tracking modes on a recorded video, returning per-mode stats."""
+    results = {}
+    for mode in modes:
+        tracker = HeadTracker(source=video_path, tracking_mode=mode)
+        latencies = []
+        start = time.perf_counter()
+        while True:
+            frame = tracker.read_frame()
+            if frame is None:
+                break
+            t0 = time.perf_counter()
+            tracker.process_frame(frame)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+        tracker.release()
+        
+        latencies.sort()
+        frames = len(latencies)
+        results[mode] = {
+            "frames": frames,
+            "fps": frames / elapsed if elapsed > 0 else 0.0,
+            "latency_mean_ms": sum(latencies) / frames * 1000 if frames else 0.0,
+            "latency_p95_ms": latencies[int(frames * 0.95)] * 1000 if frames else 0.0,
+            "full_scans": tracker.full_scans,
+            "roi_scans": tracker.roi_scans,
+            "template_hits": tracker.template_hits,
+        }
+    return results
+
+class StageTimer:
+    """Running latency counters for one stage of the tracker pipeline."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+    
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+    
+    def snapshot(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "mean_ms": mean * 1000,
+                "last_ms": self.last * 1000, "max_ms": self.max * 1000}
+
+class CaptureThread:
+    """Reads a camera on a worker thread and publishes the latest sample for each of `slots` players.
+    
+    Subclasses open the camera in open_camera(), turn a frame into one
+    (horizontal, vertical) sample per slot in process_frame(), and name the
+    FaceController behind each slot in controller(). The game thread only
+    reads what was last published, so it never waits on the camera or the
+    face cascade.
+    
+    Without a camera, the worker opens one before its first frame, so
+    opening the camera and loading the cascade never hold up the window.
+    Until then every slot reads as neutral.
+    """
+    def __init__(self, camera=None, slots=1, name="CaptureThread"):
+        self.camera = camera
+        self.startup_seconds = None  # Time to open the camera, once it's open
+        self._failed = False
+        self.latency = {"capture": StageTimer(), "detect": StageTimer(), "publish": StageTimer()}
+        self._lock = threading.Lock()
+        self._samples = [(0, 0, 0.0)] * slots
+        self._filtered = [False] * slots
+        self._calibration_requests = [None] * slots  # Applied by the worker between frames
+        self.detect_interval = 1
+        self._frames_read = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name=name, daemon=True)
+        self._thread.start()
+    
+    def open_camera(self):
+        raise NotImplementedError
+    
+    def process_frame(self, frame):
+        """Samples for one frame, as a list of (horizontal, vertical) per slot."""
+        raise NotImplementedError
+    
+    def controller(self, slot):
+        raise NotImplementedError
+    
+    def status(self):
+        camera = self.camera
+        if camera is None:
+            return "unavailable" if self._failed else "starting"
+        return camera.status()
+    
+    def _worker(self):
+        if self.camera is None:
+            start = time.perf_counter()
+            try:
+                camera = self.open_camera()
+            except Exception as e:
+                print(f"Could not start head tracking: {e}")
+                self._failed = True
+                return
+            self.startup_seconds = time.perf_counter() - start
+            self.camera = camera
+            if not self._running:
+                camera.release()  # Released while we were still opening the camera
+                return
+        while self._running:
+            t0 = time.perf_counter()
+            frame = self.camera.read_frame()
+            t1 = time.perf_counter()
+            self.latency["capture"].record(t1 - t0)
+            if frame is None:
+                time.sleep(0.01)  # Don't spin if the camera is gone
+                continue
+            self._frames_read += 1
+            if self._frames_read % self.detect_interval:
+                continue  # Frame still read so the camera buffer stays fresh; the filter predicts across the gap
             
-            face_center_x = x + w // 2
-            face_center_y = y + h // 2
-            face_size = w * h
-            
-            # Calibration phase
-            if self.frame_count < self.calibration_frames:
-                self.face_positions.append((face_center_x, face_center_y, face_size))
-                self.frame_count += 1
-                if self.frame_count == self.calibration_frames:
-                    # Calculate baseline
-                    avg_x = sum(pos[0] for pos in self.face_positions) / len(self.face_positions)
-                    avg_y = sum(pos[1] for pos in self.face_positions) / len(self.face_positions)
-                    avg_size = sum(pos[2] for pos in self.face_positions) / len(self.face_positions)
-                    self.last_face_center = (avg_x, avg_y)
-                    self.baseline_face_size = avg_size
-                    self.baseline_face_y = avg_y
-                return 0, 0
+            for slot in range(len(self._calibration_requests)):
+                request, self._calibration_requests[slot] = self._calibration_requests[slot], None
+                if request is not None:
+                    request(self.controller(slot))
+            samples = self.process_frame(frame)
+            filtered = [self.controller(slot).filtered for slot in range(len(samples))]
+            t2 = time.perf_counter()
+            self.latency["detect"].record(t2 - t1)
             
-            if self.last_face_center and self.baseline_face_size and self.baseline_face_y:
-                # Calculate movement with enhanced sensitivity
-                dx = face_center_x - self.last_face_center[0]
-                dy = face_center_y - self.baseline_face_y
-                
-                # Size change for forward/backward movement (more sensitive)
-                size_ratio = face_size / self.baseline_face_size
-                size_change = size_ratio - 1.0
-                
-                # Enhanced sensitivity for horizontal movement
-                horizontal_movement = max(-1, min(1, dx / 30))  # More sensitive steering
-                
-                # Combine size change and y-movement for vertical control
-                y_movement = max(-1, min(1, -dy / 25))  # Head up/down (inverted)
-                size_movement = max(-1, min(1, size_change * 8))  # Face closer/farther
-                
-                # Use the stronger signal for vertical movement
-                if abs(size_movement) > abs(y_movement):
-                    vertical_movement = size_movement
-                else:
-                    vertical_movement = y_movement
-                
-                # Apply smoothing
-                current_movement = (horizontal_movement, vertical_movement)
-                self.movement_smoothing.append(current_movement)
-                
-                if len(self.movement_smoothing) > self.smoothing_frames:
-                    self.movement_smoothing.pop(0)
-                
-                # Calculate smoothed movement
-                if len(self.movement_smoothing) >= 3:
-                    avg_h = sum(m[0] for m in self.movement_smoothing) / len(self.movement_smoothing)
-                    avg_v = sum(m[1] for m in self.movement_smoothing) / len(self.movement_smoothing)
-                    return avg_h, avg_v
-                else:
-                    return horizontal_movement, vertical_movement
+            now = time.time()
+            with self._lock:
+                self._samples = [(horizontal, vertical, now) for horizontal, vertical in samples]
+                self._filtered = filtered
+            self.latency["publish"].record(time.perf_counter() - t2)
+    
+    def get_sample(self, slot=0):
+        """Latest (horizontal, vertical, timestamp) sample for a slot, never blocks on the camera."""
+        with self._lock:
+            return self._samples[slot]
+    
+    def movement(self, slot=0):
+        with self._lock:
+            horizontal, vertical, timestamp = self._samples[slot]
+            filtered = self._filtered[slot]
+        now = time.time()
+        if now - timestamp > MAX_SAMPLE_AGE:
+            return 0, 0  # Tracker stalled, don't keep steering on old input
+        if filtered:
+            # Extrapolate from capture time to now to hide the capture and detection latency
+            return self.controller(slot).filter.predict(now)
+        return horizontal, vertical
+    
+    def request_calibration(self, slot, request):
+        """Run request(controller) on the worker thread before its next detection."""
+        self._calibration_requests[slot] = request
+    
+    def latency_report(self):
+        return {stage: timer.snapshot() for stage, timer in self.latency.items()}
+    
+    def release(self):
+        if not self._running:
+            return  # Already released, e.g. by another player's source
+        self._running = False
+        self._thread.join(timeout=1.0)
+        if self.camera is not None:
+            self.camera.release()
+
+class AsyncHeadTracker(CaptureThread, InputSource):
+    """Runs a HeadTracker on a worker thread and publishes its latest sample.
+    
+    The game loop calls get_head_movement() as before, but it only reads the
+    most recent smoothed (horizontal, vertical) sample instead of waiting on
+    the camera and the face cascade. Without a tracker, one is built with
+    make_tracker() on the worker thread.
+    """
+    def __init__(self, tracker=None, make_tracker=HeadTracker):
+        self.make_tracker = make_tracker
+        super().__init__(tracker, name="HeadTracker")
+    
+    @property
+    def tracker(self):
+        return self.camera
+    
+    @property
+    def frame_count(self):
+        return self.tracker.frame_count if self.tracker is not None else 0
+    
+    @property
+    def calibration_frames(self):
+        return self.tracker.calibration_frames if self.tracker is not None else HeadTracker.calibration_frames
+    
+    def open_camera(self):
+        return self.make_tracker()
+    
+    def process_frame(self, frame):
+        return [self.tracker.process_frame(frame)]
+    
+    def controller(self, slot):
+        return self.tracker  # A HeadTracker is its own FaceController
+    
+    def get_head_movement(self):
+        return self.movement()
+    
+    def calibration(self):
+        return self.tracker.calibration() if self.tracker is not None else None
+    
+    def apply_calibration(self, calibration):
+        self.request_calibration(0, lambda tracker: tracker.apply_calibration(calibration))
+    
+    def recalibrate(self):
+        self.request_calibration(0, lambda tracker: tracker.recalibrate())
+    
+    def set_detection_interval(self, interval):
+        self.detect_interval = interval
+
+class MultiFaceTracker(CaptureThread):
+    """Tracks up to `players` faces on one camera with one cascade pass per frame.
+    
+    Every detection is matched to the nearest face from the previous frame,
+    so players keep their slot as they move. Faces that match nobody take
+    the free slots in order from the left. Each slot has its own
+    FaceController, so calibration and smoothing are per player, while the
+    detection cost stays one detectMultiScale call however many are playing.
+    """
+    def __init__(self, players, source=0, profile=DEFAULT_CAPTURE_PROFILE, smoothing=SMOOTHING_FILTER,
+                 max_jump=1.0, max_misses=15):
+        self.players = players
+        self.source = source
+        self.profile = profile
+        self.max_jump = max_jump  # How far a face may move between frames, in face widths
+        self.max_misses = max_misses  # Frames a face can go unseen before its slot is freed
+        self.controllers = [FaceController(smoothing) for _ in range(players)]
+        self.tracks = [None] * players  # Each slot's last face box, in mirrored capture coordinates
+        self.misses = [0] * players
+        super().__init__(slots=players, name="MultiFaceTracker")
+    
+    def sources(self):
+        return [PlayerSource(self, player) for player in range(self.players)]
+    
+    def open_camera(self):
+        # Full-frame detection every frame, ROI tracking follows a single face
+        return HeadTracker(self.source, tracking_mode="full", profile=self.profile)
+    
+    def controller(self, slot):
+        return self.controllers[slot]
+    
+    def process_frame(self, frame):
+        camera = self.camera
+        frame_size = (frame.shape[1], frame.shape[0])
+        faces = [camera.capture_box(face, frame.shape[1])
+                 for face in camera.detect_all_faces(camera.detection_image(frame))]
+        samples = []
+        for controller, face in zip(self.controllers, self.assign(faces)):
+            controller.filtered = False
+            controller.capture_time = camera.capture_time
+            samples.append((0, 0) if face is None else controller.track_face(face, frame_size))
+        return samples
+    
+    def assign(self, faces):
+        """Give each slot this frame's face for it (or None), keeping identities stable."""
+        def center(box):
+            return box[0] + box[2] / 2, box[1] + box[3] / 2
         
-        return 0, 0
+        # Closest (slot, face) pairs first, each within max_jump face widths of where the slot's face was
+        pairs = []
+        for slot, track in enumerate(self.tracks):
+            if track is None:
+                continue
+            tx, ty = center(track)
+            for i, face in enumerate(faces):
+                fx, fy = center(face)
+                distance = math.hypot(fx - tx, fy - ty)
+                if distance <= self.max_jump * track[2]:
+                    pairs.append((distance, slot, i))
+        assigned = [None] * self.players
+        used = set()
+        for _, slot, i in sorted(pairs):
+            if assigned[slot] is None and i not in used:
+                assigned[slot] = faces[i]
+                used.add(i)
+        
+        # Unmatched faces, left to right, take the free slots in order
+        free = [slot for slot, track in enumerate(self.tracks) if track is None]
+        unmatched = sorted((face for i, face in enumerate(faces) if i not in used), key=lambda f: f[0])
+        for slot, face in zip(free, unmatched):
+            assigned[slot] = face
+        
+        for slot, face in enumerate(assigned):
+            if face is not None:
+                self.tracks[slot] = face
+                self.misses[slot] = 0
+            elif self.tracks[slot] is not None:
+                self.misses[slot] += 1
+                if self.misses[slot] > self.max_misses:
+                    self.tracks[slot] = None  # Gone long enough that the next new face can have the slot
+        return assigned
+
+class PlayerSource(InputSource):
+    """One player's view of a MultiFaceTracker."""
+    def __init__(self, tracker, player):
+        self.tracker = tracker
+        self.player = player
+    
+    @property
+    def controller(self):
+        return self.tracker.controllers[self.player]
+    
+    @property
+    def frame_count(self):
+        return self.controller.frame_count
+    
+    @property
+    def calibration_frames(self):
+        return self.controller.calibration_frames
+    
+    def get_head_movement(self):
+        return self.tracker.movement(self.player)
+    
+    def set_detection_interval(self, interval):
+        self.tracker.detect_interval = interval
+    
+    def calibration(self):
+        return self.controller.calibration()
+    
+    def apply_calibration(self, calibration):
+        self.tracker.request_calibration(self.player, lambda controller: controller.apply_calibration(calibration))
+    
+    def recalibrate(self):
+        self.tracker.request_calibration(self.player, lambda controller: controller.recalibrate())
+    
+    def status(self):
+        return self.tracker.status()
+    
+    def latency_report(self):
+        # Every player shares the one pipeline, so only the first reports it
+        return self.tracker.latency_report() if self.player == 0 else {}
+    
+    def release(self):
+        self.tracker.release()
+
+class InputGroup(InputSource):
+    """Several players' sources behind one, returning a list of movements per sample."""
+    def __init__(self, sources):
+        self.sources = list(sources)
+    
+    def bind(self, game):
+        super().bind(game)
+        for source in self.sources:
+            source.bind(game)
+    
+    def get_head_movement(self):
+        return [source.get_head_movement() for source in self.sources]
+    
+    def recalibrate(self):
+        for source in self.sources:
+            source.recalibrate()
+    
+    def status(self):
+        # The least ready source speaks for the group
+        statuses = [source.status() for source in self.sources]
+        for status in ("unavailable", "starting"):
+            if status in statuses:
+                return status
+        return "ready"
+    
+    def set_detection_interval(self, interval):
+        for source in self.sources:
+            source.set_detection_interval(interval)
+    
+    def latency_report(self):
+        report = {}
+        for source in self.sources:
+            report.update(source.latency_report())
+        return report
+    
+    def release(self):
+        for source in self.sources:
+            source.release()
+
+def load_trace(path):
+    """Read a movement trace CSV of (time, horizontal, vertical) rows."""
+    with open(path, newline="") as f:
+        return [(float(t), float(h), float(v)) for t, h, v in csv.reader(f)]
+
+def save_trace(path, samples):
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(samples)
+
+class TraceSource(InputSource):
+    """Plays back a recorded movement trace against the game clock."""
+    def __init__(self, samples):
+        self.samples = samples
+        self.start = None
+        self.index = 0
+    
+    def get_head_movement(self):
+        if not self.samples:
+            return 0, 0
+        now = self.game.now()
+        if self.start is None:
+            self.start = now
+        elapsed = now - self.start + self.samples[0][0]
+        # Samples are in time order, so only ever walk forwards
+        while self.index + 1 < len(self.samples) and self.samples[self.index + 1][0] <= elapsed:
+            self.index += 1
+        _, horizontal, vertical = self.samples[self.index]
+        return horizontal, vertical
+
+class TraceRecorder(InputSource):
+    """Wraps another source and records every sample it hands to the game."""
+    def __init__(self, source):
+        self.source = source
+        self.samples = []
+    
+    @property
+    def frame_count(self):
+        return self.source.frame_count
+    
+    @property
+    def calibration_frames(self):
+        return self.source.calibration_frames
+    
+    def bind(self, game):
+        super().bind(game)
+        self.source.bind(game)
+    
+    def get_head_movement(self):
+        horizontal, vertical = self.source.get_head_movement()
+        self.samples.append((self.game.now(), horizontal, vertical))
+        return horizontal, vertical
+    
+    def calibration(self):
+        return self.source.calibration()
+    
+    def apply_calibration(self, calibration):
+        self.source.apply_calibration(calibration)
+    
+    def recalibrate(self):
+        self.source.recalibrate()
+    
+    def status(self):
+        return self.source.status()
+    
+    def set_detection_interval(self, interval):
+        self.source.set_detection_interval(interval)
+    
+    def latency_report(self):
+        return self.source.latency_report()
+    
+    def release(self):
+        self.source.release()
+
+REPLAY_MAGIC = b"HRREPLAY"
+REPLAY_VERSION = 1
+# One row per simulation step: the movement update_game consumed and a checksum of the state it produced
+REPLAY_STEP_DTYPE = np.dtype([("horizontal", "<f8"), ("vertical", "<f8"), ("checksum", "<u4")])
+REPLAY_SNAPSHOT_DTYPE = np.dtype([("step", "<i8"), ("car_x", "<f8"), ("car_speed", "<f8"), ("road_offset", "<f8"),
+                                  ("distance", "<f8"), ("scroll", "<f8"), ("sim_time", "<f8"), ("start_time", "<f8")])
+
+def state_checksum(game):
+    """CRC of everything a simulation step changes, to spot where a replay diverges."""
+    return zlib.crc32(struct.pack("<5d", game.car_x, game.car_speed, game.distance_traveled,
+                                  game.world.scroll, game.road_offset))
+
+class Replay:
+    """One recorded race: its seed and settings, every step's input and periodic state snapshots.
+    
+    On disk it's a magic number, a JSON header and then the step and
+    snapshot arrays as raw little-endian records, so load() can memory-map
+    them instead of reading the whole file.
+    """
+    def __init__(self, header, steps, snapshots):
+        self.header = header
+        self.steps = steps
+        self.snapshots = snapshots
+    
+    @property
+    def seed(self):
+        return self.header["seed"]
+    
+    @property
+    def race_time(self):
+        return self.header["race_time"]
+    
+    @property
+    def state(self):
+        return self.header["state"]
+    
+    def save(self, path):
+        header = json.dumps(dict(self.header, steps=len(self.steps), snapshots=len(self.snapshots))).encode()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(REPLAY_MAGIC)
+            f.write(struct.pack("<II", REPLAY_VERSION, len(header)))
+            f.write(header)
+            f.write(np.ascontiguousarray(self.steps, REPLAY_STEP_DTYPE).tobytes())
+            f.write(np.ascontiguousarray(self.snapshots, REPLAY_SNAPSHOT_DTYPE).tobytes())
+    
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(path, "rb") as f:
+            if f.read(len(REPLAY_MAGIC)) != REPLAY_MAGIC:
+                raise ValueError(f"{path} is not a replay")
+            version, header_length = struct.unpack("<II", f.read(8))
+            if version != REPLAY_VERSION:
+                raise ValueError(f"Unsupported replay version {version}")
+            header = json.loads(f.read(header_length))
+            offset = f.tell()
+        steps = cls._read(path, REPLAY_STEP_DTYPE, header["steps"], offset, mmap)
+        offset += header["steps"] * REPLAY_STEP_DTYPE.itemsize
+        snapshots = cls._read(path, REPLAY_SNAPSHOT_DTYPE, header["snapshots"], offset, mmap)
+        return cls(header, steps, snapshots)
+    
+    @staticmethod
+    def _read(path, dtype, count, offset, mmap):
+        if count == 0:
+            return np.empty(0, dtype)  # memmap can't map zero bytes
+        if mmap:
+            return np.memmap(path, dtype, "r", offset, (count,))
+        return np.fromfile(path, dtype, count, offset=offset)
+
+class ReplayRecorder:
+    """Records every race a game plays and saves each one as a Replay when it ends.
+    
+    Steps go into a preallocated array that doubles when full, and the
+    state is snapshotted every snapshot_interval steps for seeking. Files
+    are written on a background thread; without a directory the last
+    replay is only kept in memory.
+    """
+    def __init__(self, directory=None, snapshot_interval=REPLAY_SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.last_replay = None
+        self.races = 0
+        self._header = None
+        self._steps = np.empty(4096, REPLAY_STEP_DTYPE)
+        self._snapshots = []
+        self._count = 0
+    
+    def begin(self, game):
+        self._header = {
+            "seed": game.seed,
+            "player": game.player_name,
+            "course_length": game.course_length,
+            "tuning": game.tuning,
+            "sim_dt": SIM_DT,
+            "snapshot_interval": self.snapshot_interval,
+            "recorded_at": time.time(),
+        }
+        self._count = 0
+        self._snapshots = [self.snapshot(game, 0)]
+    
+    @staticmethod
+    def snapshot(game, step):
+        return (step, game.car_x, game.car_speed, game.road_offset, game.distance_traveled, game.world.scroll,
+                game.sim_time, game.start_time)
+    
+    def record_step(self, game, movement):
+        if self._header is None:
+            return  # Race started before the recorder was attached
+        if self._count == len(self._steps):
+            self._steps = np.resize(self._steps, 2 * len(self._steps))
+        self._steps[self._count] = (movement[0], movement[1], state_checksum(game))
+        self._count += 1
+        if game.game_state != "playing":
+            self.finish(game)
+        elif self._count % self.snapshot_interval == 0:
+            self._snapshots.append(self.snapshot(game, self._count))
+    
+    def finish(self, game):
+        race_end = game.finish_time if game.game_state == "finished" else game.now()
+        header = dict(self._header, state=game.game_state, race_time=race_end - game.start_time)
+        replay = Replay(header, self._steps[:self._count].copy(), np.array(self._snapshots, REPLAY_SNAPSHOT_DTYPE))
+        self._header = None
+        self.last_replay = replay
+        self.races += 1
+        if self.directory:
+            player = "".join(c for c in replay.header["player"] if c.isalnum()) or "player"
+            # The race counter and seed keep names unique when several races end within a second
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.races:04d}-{replay.seed}-{player}.hrr"
+            # Off the game loop, so the finish line never waits on the disk
+            threading.Thread(target=replay.save, args=(os.path.join(self.directory, name),), daemon=False).start()
+
+class ReplaySource(InputSource):
+    """Feeds a replay's recorded movement back, one simulation step per call."""
+    def __init__(self, replay):
+        self.horizontal = replay.steps["horizontal"]
+        self.vertical = replay.steps["vertical"]
+        self.index = 0
+    
+    def get_head_movement(self):
+        if self.index >= len(self.horizontal):
+            return 0, 0
+        movement = float(self.horizontal[self.index]), float(self.vertical[self.index])
+        self.index += 1
+        return movement
+
+class ScriptedSource(InputSource):
+    """Steers with a policy function that maps the game state to (horizontal, vertical)."""
+    def __init__(self, policy):
+        self.policy = policy
+    
+    def get_head_movement(self):
+        return self.policy(self.game)
+
+def straight_policy(game):
+    # Hold the lane and keep accelerating
+    return 0, 1
+
+def dodge_policy(game):
+    # Accelerate, and swerve toward the emptier side when a hurdle is ahead in our path
+    hurdles = game.world.hurdles
+    for i in game.world.visible(hurdles, game.car_y - 400, game.car_y):
+        center_x = hurdles.x[i] + hurdles.w[i] / 2
+        if abs(center_x - game.car_x) < CAR_WIDTH:
+            return (-1 if center_x > game.car_x else 1), 0
+    return 0, 1
+
+POLICIES = {
+    "straight": straight_policy,
+    "dodge": dodge_policy,
+}
+
+def open_input_source(spec, smoothing=SMOOTHING_FILTER, profile=DEFAULT_CAPTURE_PROFILE):
+    """Build an input source from "camera", "video:PATH", "trace:PATH" or "scripted:NAME"."""
+    kind, _, arg = spec.partition(":")
+    if kind == "camera":
+        if ASYNC_HEAD_TRACKING:
+            # Open the camera on the tracker thread so the window can come up meanwhile
+            return AsyncHeadTracker(make_tracker=lambda: HeadTracker(profile=profile, smoothing=smoothing))
+        return HeadTracker(profile=profile, smoothing=smoothing)
+    if kind == "video":
+        # Read video frames synchronously so every step sees the next frame
+        return HeadTracker(source=arg, profile=profile, smoothing=smoothing)
+    if kind == "trace":
+        return TraceSource(load_trace(arg))
+    if kind == "scripted":
+        return ScriptedSource(POLICIES[arg])
+    raise ValueError(f"Unknown input source: {spec}")
+
+class GameObject:
+    """Size and drawing for one kind of world object.
+    
+    Positions live in a WorldStore, so objects are drawn with draw_at(x, y)
+    rather than carrying their own rects.
+    """
+    width = 0
+    height = 0
+    color = BLACK
+    opaque = True  # Sprite fills its whole bounding box
+    
+    @classmethod
+    def sprite_bounds(cls):
+        """(x offset, y offset, width, height) of everything draw_at paints, relative to (x, y)."""
+        return 0, 0, cls.width, cls.height
+    
+    @classmethod
+    def draw_at(cls, screen, x, y):
+        pygame.draw.rect(screen, cls.color, (x, y, cls.width, cls.height))
+
+class Tree(GameObject):
+    width = 30
+    height = 80
+    color = BROWN
+    opaque = False
+    
+    @classmethod
+    def sprite_bounds(cls):
+        return -20, -40, 70, 120
+    
+    @classmethod
+    def draw_at(cls, screen, x, y):
+        # Draw trunk
+        pygame.draw.rect(screen, cls.color, (x, y, cls.width, cls.height))
+        # Draw leaves
+        pygame.draw.ellipse(screen, TREE_GREEN, (x - 20, y - 40, 70, 60))
+
+class House(GameObject):
+    width = 80
+    height = 60
+    color = HOUSE_COLOR
+    opaque = False
+    
+    @classmethod
+    def sprite_bounds(cls):
+        return 0, -20, 80, 80
+    
+    @classmethod
+    def draw_at(cls, screen, x, y):
+        # Draw house
+        pygame.draw.rect(screen, cls.color, (x, y, cls.width, cls.height))
+        # Draw roof
+        pygame.draw.polygon(screen, RED, [(x + 40, y - 20), (x, y), (x + 80, y)])
+        # Draw door
+        pygame.draw.rect(screen, DARK_GRAY, (x + 30, y + 20, 20, 40))
+
+class Hurdle(GameObject):
+    width = 40
+    height = 30
+    color = RED
+    
+    @classmethod
+    def draw_at(cls, screen, x, y):
+        rect = (x, y, cls.width, cls.height)
+        pygame.draw.rect(screen, cls.color, rect)
+        pygame.draw.rect(screen, WHITE, rect, 3)
+
+class SpriteCache:
+    """Pre-rendered sprites, so drawing an object is a single blit.
+    
+    Each sprite is rasterized once from its primitive drawing code and
+    converted to the display format. Sprites are kept per target size and
+    depth; for targets narrower than the screen they are scaled down by
+    the same factor, which callers read from scale to place them. Call
+    invalidate() after changing colours.
+    """
+    def __init__(self):
+        self._caches = {}  # (target size, depth) -> {name: (surface, offset)}
+        self._sprites = {}
+        self._key = None
+        self.scale = 1.0
+    
+    def validate(self, target):
+        key = (target.get_size(), target.get_bitsize())
+        if key != self._key:
+            self._sprites = self._caches.setdefault(key, {})
+            self._key = key
+            self.scale = target.get_width() / SCREEN_WIDTH
+    
+    def invalidate(self):
+        self._caches.clear()
+        self._sprites = {}
+        self._key = None
+    
+    def get(self, name, size, painter, offset=(0, 0), opaque=False, alpha=None):
+        """(surface, offset) for name, rasterizing it with painter(surface) on first use.
+        
+        alpha gives an opaque sprite a whole-surface transparency, for overlays.
+        """
+        sprite = self._sprites.get(name)
+        if sprite is None:
+            surface = pygame.Surface(size, 0 if opaque else pygame.SRCALPHA)
+            painter(surface)
+            if self.scale != 1.0:
+                # Painted at full size so the drawing code stays in screen coordinates
+                size = (max(1, round(size[0] * self.scale)), max(1, round(size[1] * self.scale)))
+                surface = pygame.transform.smoothscale(surface, size)
+                offset = (offset[0] * self.scale, offset[1] * self.scale)
+            surface = surface.convert() if opaque else surface.convert_alpha()
+            if alpha is not None:
+                surface.set_alpha(alpha)
+            sprite = (surface, offset)
+            self._sprites[name] = sprite
+        return sprite
+    
+    def kind(self, kind):
+        ox, oy, width, height = kind.sprite_bounds()
+        return self.get(kind.__name__, (width, height), lambda surface: kind.draw_at(surface, -ox, -oy),
+                        (ox, oy), kind.opaque)
+
+class TextCache:
+    """Rendered text surfaces keyed by (text, font, colour), evicting the least recently used."""
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self._surfaces = OrderedDict()
+    
+    def render(self, font, text, color):
+        key = (text, font, color)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self._surfaces[key] = surface
+            if len(self._surfaces) > self.capacity:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surface
+    
+    def clear(self):
+        self._surfaces.clear()
+
+class ObjectLayer:
+    """Positions and sizes of every object of one kind, as parallel NumPy arrays.
+    
+    y is in course coordinates (screen y at the start of the race). Adds are
+    buffered in lists and folded into the arrays the next time they're read.
+    
+    The arrays are kept sorted by y, which makes the layer its own spatial
+    index: any band of rows is a contiguous slice found by binary search.
+    """
+    def __init__(self, kind):
+        self.kind = kind
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+        self._w = np.empty(0)
+        self._h = np.empty(0)
+        self._pending = []
+        self._max_height = 0.0  # Tallest object, bounds how far above a row an overlap can start
+    
+    def add(self, x, y, width=None, height=None):
+        self._pending.append((x, y, width or self.kind.width, height or self.kind.height))
+    
+    def _flush(self):
+        if self._pending:
+            x, y, w, h = (np.array(column, dtype=float) for column in zip(*self._pending))
+            self._pending = []
+            self._max_height = max(self._max_height, float(h.max()))
+            order = np.argsort(y, kind="stable")
+            x, y, w, h = x[order], y[order], w[order], h[order]
+            if not len(self._y) or y[-1] <= self._y[0]:
+                # New course chunks lie entirely ahead of what's stored, so they just go in front
+                self._x = np.concatenate((x, self._x))
+                self._y = np.concatenate((y, self._y))
+                self._w = np.concatenate((w, self._w))
+                self._h = np.concatenate((h, self._h))
+            else:
+                x, y, w, h = (np.concatenate(pair) for pair in
+                              ((x, self._x), (y, self._y), (w, self._w), (h, self._h)))
+                order = np.argsort(y, kind="stable")
+                self._x, self._y, self._w, self._h = x[order], y[order], w[order], h[order]
+    
+    def span(self, top, bottom):
+        """(start, stop) of the objects with top <= y <= bottom, in course coordinates."""
+        y = self.y
+        return int(np.searchsorted(y, top, "left")), int(np.searchsorted(y, bottom, "right"))
+    
+    @property
+    def x(self):
+        self._flush()
+        return self._x
+    
+    @property
+    def y(self):
+        self._flush()
+        return self._y
+    
+    @property
+    def max_height(self):
+        self._flush()
+        return self._max_height
+    
+    @property
+    def w(self):
+        self._flush()
+        return self._w
+    
+    @property
+    def h(self):
+        self._flush()
+        return self._h
+    
+    def __len__(self):
+        return len(self._x) + len(self._pending)
+    
+    def truncate(self, limit):
+        """Drop every object with y >= limit. They're all at the end, so this is a slice."""
+        stop = int(np.searchsorted(self.y, limit, "left"))
+        self._x = self._x[:stop]
+        self._y = self._y[:stop]
+        self._w = self._w[:stop]
+        self._h = self._h[:stop]
+    
+    def clear(self):
+        self._x = self._y = self._w = self._h = np.empty(0)
+        self._pending = []
+        self._max_height = 0.0
+
+class WorldStore:
+    """All world objects plus the scroll offset that moves them down the screen.
+    
+    Objects never move in course coordinates; scrolling only bumps scroll,
+    and screen y is course y + scroll.
+    """
+    def __init__(self):
+        self.scroll = 0.0
+        self.trees = ObjectLayer(Tree)
+        self.houses = ObjectLayer(House)
+        self.hurdles = ObjectLayer(Hurdle)
+        self.layers = (self.trees, self.houses, self.hurdles)
+    
+    def advance(self, dy):
+        self.scroll += dy
+    
+    def screen_y(self, layer):
+        return layer.y + self.scroll
+    
+    def cull(self, limit=SCREEN_HEIGHT + 100):
+        """Drop every object that has scrolled past limit on screen."""
+        for layer in self.layers:
+            if len(layer):
+                layer.truncate(limit - self.scroll)
+    
+    def visible(self, layer, top=-100, bottom=SCREEN_HEIGHT + 100):
+        """range() of the objects whose screen y is within [top, bottom]."""
+        return range(*layer.span(top - self.scroll, bottom - self.scroll))
+    
+    def collides(self, layer, rect):
+        """True if rect overlaps any object, with the same edge rules as Rect.colliderect."""
+        if not len(layer):
+            return False
+        # Only objects whose rows can reach the rect need testing; +-1 covers truncation
+        start, stop = layer.span(rect.top - layer.max_height - self.scroll - 1, rect.bottom - self.scroll + 1)
+        if start == stop:
+            return False
+        # Rect truncates float coordinates toward zero, so do the same before comparing
+        x = np.trunc(layer.x[start:stop])
+        y = np.trunc(layer.y[start:stop] + self.scroll)
+        hit = ((x < rect.right) & (x + layer.w[start:stop] > rect.left) &
+               (y < rect.bottom) & (y + layer.h[start:stop] > rect.top))
+        return bool(hit.any())
+    
+    def clear(self):
+        self.scroll = 0.0
+        for layer in self.layers:
+            layer.clear()
+
+class CourseGenerator:
+    """Streams scenery and hurdles into a WorldStore one fixed-length chunk at a time.
+    
+    Chunk k covers course distance [k * chunk_length, (k + 1) * chunk_length)
+    and is laid out by its own RNG derived from (seed, k), so a chunk comes
+    out the same no matter when it's generated. Passing course_length=None
+    makes the course endless.
+    """
+    def __init__(self, seed, course_length=FINISH_LINE_DISTANCE, chunk_length=COURSE_CHUNK_LENGTH,
+                 hurdle_spacing=DEFAULT_TUNING["hurdle_spacing"], scenery_density=1.0):
+        self.seed = seed
+        self.hurdle_spacing = hurdle_spacing
+        self.scenery_density = scenery_density  # Fraction of tree and house rows kept, for slow machines
+        self.course_length = course_length
+        self.chunk_length = chunk_length
+        # Scenery only needs to reach past the finish line by what's visible above it
+        self.limit = None if course_length is None else course_length + COURSE_LOOKAHEAD
+        self.next_chunk = 0
+    
+    def chunk_rng(self, index):
+        return random.Random(f"{self.seed}:{index}")
+    
+    def fill(self, world):
+        """Generate every chunk that is about to scroll onto the screen."""
+        while True:
+            start = self.next_chunk * self.chunk_length
+            if start >= world.scroll + COURSE_LOOKAHEAD:
+                break
+            if self.limit is not None and start >= self.limit:
+                break
+            self.generate_chunk(world, self.next_chunk)
+            self.next_chunk += 1
+    
+    def generate_chunk(self, world, index):
+        rng = self.chunk_rng(index)
+        base = -index * self.chunk_length
+        
+        # Generate trees on both sides
+        for i in range(self.chunk_length // 200):
+            y_pos = base - i * 200 - rng.randint(0, 100)
+            # Left side trees
+            if rng.random() < 0.7:
+                self.add_scenery(world.trees, i, 50 + rng.randint(0, 100), y_pos)
+            # Right side trees
+            if rng.random() < 0.7:
+                self.add_scenery(world.trees, i, SCREEN_WIDTH - 150 + rng.randint(0, 100), y_pos)
+        
+        # Generate houses
+        for i in range(self.chunk_length // 300):
+            y_pos = base - i * 300 - rng.randint(0, 200)
+            side = rng.choice(["left", "right"])
+            if side == "left":
+                self.add_scenery(world.houses, i, 100 + rng.randint(0, 50), y_pos)
+            else:
+                self.add_scenery(world.houses, i, SCREEN_WIDTH - 200 + rng.randint(0, 50), y_pos)
+        
+        # Generate hurdles on the road, none past the finish line. Hurdle k sits in slot
+        # [k * spacing, (k + 1) * spacing) of a course-wide grid, so any spacing keeps its density
+        # across chunk boundaries; the chunk lays out the hurdles whose slots start inside it
+        finish_y = None if self.course_length is None else SCREEN_HEIGHT - self.course_length
+        spacing = self.hurdle_spacing
+        first_slot = -(-index * self.chunk_length // spacing)  # Ceiling division
+        end_slot = -(-(index + 1) * self.chunk_length // spacing)
+        for k in range(first_slot, end_slot):
+            y_pos = -k * spacing - rng.randint(spacing // 2, spacing)
+            lane = rng.randint(0, 2)  # 3 lanes
+            if finish_y is not None and y_pos < finish_y:
+                continue
+            x_pos = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2 + lane * LANE_WIDTH + LANE_WIDTH // 2 - 20
+            world.hurdles.add(x_pos, y_pos)
+    
+    def add_scenery(self, layer, row, x, y):
+        # Thinning never skips a random draw, so hurdles come out the same at any density
+        if (row * self.scenery_density) % 1.0 < self.scenery_density:
+            layer.add(x, y)
+
+# One row per particle; x, y are screen coordinates, velocities and gravity are per second
+PARTICLE_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("vx", "<f4"), ("vy", "<f4"), ("gravity", "<f4"),
+                           ("drag", "<f4"), ("sway", "<f4"), ("phase", "<f4"), ("age", "<f4"), ("life", "<f4"),
+                           ("style", "<u2")])
+
+def balloon_style(color, string_length):
+    def paint(surface):
+        pygame.draw.circle(surface, color, (20, 20), 20)
+        pygame.draw.circle(surface, BLACK, (20, 20), 20, 2)
+        # String
+        pygame.draw.line(surface, BLACK, (20, 40), (20, 20 + string_length), 2)
+    return f"balloon_{color}_{string_length}", (41, 22 + string_length), (-20, -20), paint
+
+def confetti_style(color):
+    return f"confetti_{color}", (5, 9), (-2, -4), lambda surface: surface.fill(color)
+
+def dust_style(shade):
+    def paint(surface):
+        pygame.draw.circle(surface, (shade, shade, shade, 110), (5, 5), 5)
+    return f"dust_{shade}", (10, 10), (-5, -5), paint
+
+class ParticleSystem:
+    """Particles held in one NumPy array and advanced together.
+    
+    Every particle has a position, velocity, gravity, drag, sideways sway,
+    lifetime and a style (a sprite registered with add_styles). update()
+    moves them all in one vectorized step and compacts out the dead ones;
+    draw() puts them on screen with a single blits() call from cached
+    sprites. Emitting past the limit drops the extra particles; the
+    quality governor lowers the limit on slow machines.
+    """
+    def __init__(self, capacity=PARTICLE_CAPACITY, rng=None):
+        self.particles = np.zeros(capacity, PARTICLE_DTYPE)
+        self.count = 0
+        self.limit = capacity  # Most live particles allowed, at most capacity
+        self.styles = []  # (sprite name, size, offset, painter)
+        self.rng = rng if rng is not None else np.random.default_rng()
+    
+    def add_styles(self, styles):
+        """Register sprite styles, returning their indices for emit()."""
+        start = len(self.styles)
+        self.styles.extend(styles)
+        return np.arange(start, len(self.styles))
+    
+    def emit(self, count, style, x, y, vx=0.0, vy=0.0, gravity=0.0, drag=0.0, sway=0.0, life=10.0):
+        """Add count particles, each property a scalar or an array of count values; returns how many fit."""
+        count = min(count, self.limit - self.count)
+        if count <= 0:
+            return 0
+        new = self.particles[self.count:self.count + count]
+        for field, value in (("style", style), ("x", x), ("y", y), ("vx", vx), ("vy", vy), ("gravity", gravity),
+                             ("drag", drag), ("sway", sway), ("life", life)):
+            new[field] = value[:count] if np.ndim(value) else value
+        new["phase"] = self.rng.uniform(0, 2 * np.pi, count)
+        new["age"] = 0
+        self.count += count
+        return count
+    
+    def update(self, dt):
+        live = self.particles[:self.count]
+        if not len(live):
+            return
+        live["age"] += dt
+        live["vy"] += live["gravity"] * dt
+        damping = np.maximum(0.0, 1.0 - live["drag"] * dt)
+        live["vx"] *= damping
+        live["vy"] *= damping
+        wobble = live["sway"] * np.sin(2 * np.pi * PARTICLE_SWAY_HZ * live["age"] + live["phase"])
+        live["x"] += (live["vx"] + wobble) * dt
+        live["y"] += live["vy"] * dt
+        
+        # Expired or well off screen; survivors keep their order so draw order doesn't flicker
+        alive = ((live["age"] < live["life"]) & (live["y"] > -150) & (live["y"] < SCREEN_HEIGHT + 250) &
+                 (live["x"] > -100) & (live["x"] < SCREEN_WIDTH + 100))
+        if not alive.all():
+            survivors = live[alive]
+            self.particles[:len(survivors)] = survivors
+            self.count = len(survivors)
     
-    def release(self):
-        self.cap.release()
-
-class GameObject:
-    def __init__(self, x, y, width, height, color):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.color = color
-        self.rect = pygame.Rect(x, y, width, height)
+    def draw(self, screen, sprites, collect_rects=False):
+        """Blit every particle, returning the changed rects if collect_rects is set."""
+        if not self.count:
+            return []
+        sprites.validate(screen)
+        scale = sprites.scale
+        resolved = [sprites.get(name, size, painter, offset) for name, size, offset, painter in self.styles]
+        surfaces = [surface for surface, _ in resolved]
+        offsets = np.array([offset for _, offset in resolved], dtype=np.float32)
+        live = self.particles[:self.count]
+        style = live["style"]
+        xs = live["x"] * scale + offsets[style, 0]
+        ys = live["y"] * scale + offsets[style, 1]
+        batch = list(zip(map(surfaces.__getitem__, style.tolist()), zip(xs.tolist(), ys.tolist())))
+        if collect_rects:
+            return screen.blits(batch)
+        screen.blits(batch, doreturn=False)
+        return []
     
-    def update_position(self, dx, dy):
-        self.x += dx
-        self.y += dy
-        self.rect.x = self.x
-        self.rect.y = self.y
+    def set_limit(self, limit):
+        """Cap the live particles, dropping the oldest at once if there are already more."""
+        self.limit = max(0, min(int(limit), len(self.particles)))
+        if self.count > self.limit:
+            self.particles[:self.limit] = self.particles[self.count - self.limit:self.count]
+            self.count = self.limit
     
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
+    def clear(self):
+        self.count = 0
 
-class Tree(GameObject):
-    def __init__(self, x, y):
-        super().__init__(x, y, 30, 80, BROWN)
-        self.leaves_rect = pygame.Rect(x - 20, y - 40, 70, 60)
+class FrameProfiler:
+    """Per-phase frame timings kept in a ring buffer, with an optional full trace.
     
-    def draw(self, screen):
-        # Draw trunk
-        pygame.draw.rect(screen, self.color, self.rect)
-        # Draw leaves
-        pygame.draw.ellipse(screen, TREE_GREEN, self.leaves_rect)
+    Nested phases record exclusive time, so the tracker call inside the
+    simulation step is reported as "tracking" and not counted twice.
     
-    def update_position(self, dx, dy):
-        super().update_position(dx, dy)
-        self.leaves_rect.x += dx
-        self.leaves_rect.y += dy
-
-class House(GameObject):
-    def __init__(self, x, y):
-        super().__init__(x, y, 80, 60, HOUSE_COLOR)
-        self.roof_points = [(x + 40, y - 20), (x, y), (x + 80, y)]
+    The trace is streamed to trace_path as the session runs, Chrome trace
+    JSON for a .json path and one CSV row per frame otherwise, so a long
+    session never holds more than a batch of events in memory. close()
+    finishes the file.
+    """
+    PHASES = ("input", "tracking", "simulation", "draw", "flip", "wait")
+    PHASE_COLORS = {
+        "input": (200, 200, 200),
+        "tracking": (255, 165, 0),
+        "simulation": (0, 200, 255),
+        "draw": (0, 255, 0),
+        "flip": (255, 0, 255),
+        "wait": (90, 90, 90),
+    }
     
-    def draw(self, screen):
-        # Draw house
-        pygame.draw.rect(screen, self.color, self.rect)
-        # Draw roof
-        pygame.draw.polygon(screen, RED, self.roof_points)
-        # Draw door
-        door_rect = pygame.Rect(self.x + 30, self.y + 20, 20, 40)
-        pygame.draw.rect(screen, DARK_GRAY, door_rect)
+    TRACE_BATCH = 4096  # Chrome trace events buffered between writes
+    
+    def __init__(self, capacity=240, trace_path=None):
+        self.frames = deque(maxlen=capacity)  # (frame start, {phase: seconds})
+        self.current = None
+        self.frame_start = 0.0
+        self._stack = []
+        self._trace = None
+        self._csv = None
+        self._events = []  # (phase, start, duration) not yet written to the Chrome trace
+        self._separator = ""
+        self._frame_count = 0
+        if trace_path is None:
+            return
+        if trace_path.endswith(".json"):
+            self._trace = open(trace_path, "w")
+            self._trace.write('{"displayTimeUnit": "ms", "traceEvents": [')
+        else:
+            self._trace = open(trace_path, "w", newline="")
+            self._csv = csv.writer(self._trace)
+            self._csv.writerow(["frame", "start_ms"] + [f"{name}_ms" for name in self.PHASES])
     
-    def update_position(self, dx, dy):
-        super().update_position(dx, dy)
-        self.roof_points = [(self.x + 40, self.y - 20), (self.x, self.y), (self.x + 80, self.y)]
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+    
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        self._stack.append(0.0)  # Time spent in nested phases
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            if self.current is not None:
+                self.current[name] = self.current.get(name, 0.0) + elapsed - nested
+            if self._trace is not None and self._csv is None:
+                self._events.append((name, start, elapsed))
+    
+    def end_frame(self):
+        if self.current is not None:
+            self.frames.append((self.frame_start, self.current))
+            if self._csv is not None:
+                self._csv.writerow([self._frame_count, f"{self.frame_start * 1000:.3f}"] +
+                                   [f"{self.current[name] * 1000:.3f}" for name in self.PHASES])
+            self._frame_count += 1
+            self.current = None
+        if len(self._events) >= self.TRACE_BATCH:
+            self._write_events()
+    
+    def _write_events(self):
+        chunks = []
+        for name, start, duration in self._events:
+            event = {"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": 0, "tid": 0}
+            chunks.append(self._separator + json.dumps(event))
+            self._separator = ","
+        self._trace.write("".join(chunks))
+        self._events = []
+    
+    def close(self):
+        """Flush the trace and finish the file."""
+        if self._trace is None:
+            return
+        if self._csv is None:
+            self._write_events()
+            self._trace.write("]}")
+        self._trace.close()
+        self._trace = self._csv = None
+    
+    def averages(self):
+        totals = dict.fromkeys(self.PHASES, 0.0)
+        for _, phases in self.frames:
+            for name, seconds in phases.items():
+                totals[name] += seconds
+        count = max(1, len(self.frames))
+        return {name: seconds / count for name, seconds in totals.items()}
+    
+    def draw_overlay(self, screen, font, sprites, text):
+        """Draw the frame-time panel from the game's caches, so it adds little to the draw time it shows."""
+        width, height = 360, 220
+        left, top = SCREEN_WIDTH - width - 10, 10
+        sprites.validate(screen)
+        panel, _ = sprites.get("profiler_panel", (width, height), lambda surface: surface.fill(BLACK),
+                               opaque=True, alpha=200)
+        panel_rect = screen.blit(panel, (left, top))
+        
+        # Frame-time graph, one stacked bar per frame, with the 60 FPS budget marked
+        graph_bottom = top + 110
+        ms_scale = 3  # Pixels per millisecond
+        budget_y = graph_bottom - int(1000 / FPS * ms_scale)
+        pygame.draw.line(screen, RED, (left, budget_y), (left + width, budget_y), 1)
+        bar_width = max(1, width // max(1, self.frames.maxlen))
+        for i, (_, phases) in enumerate(self.frames):
+            y = graph_bottom
+            for name in self.PHASES:
+                if name == "wait":
+                    continue
+                bar = int(phases.get(name, 0.0) * 1000 * ms_scale)
+                if bar > 0:
+                    pygame.draw.rect(screen, self.PHASE_COLORS[name], (left + i * bar_width, y - bar, bar_width, bar))
+                    y -= bar
+        
+        # Per-phase breakdown averaged over the buffer
+        averages = self.averages()
+        work = sum(seconds for name, seconds in averages.items() if name != "wait")
+        screen.blit(text.render(font, f"Work {work * 1000:.1f} ms/frame", WHITE), (left + 8, graph_bottom + 4))
+        for i, name in enumerate(self.PHASES):
+            label = text.render(font, f"{name} {averages[name] * 1000:.1f}", self.PHASE_COLORS[name])
+            screen.blit(label, (left + 8 + (i % 3) * 118, graph_bottom + 34 + (i // 3) * 30))
+        return panel_rect
 
-class Hurdle(GameObject):
-    def __init__(self, x, y):
-        super().__init__(x, y, 40, 30, RED)
-    
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
-        pygame.draw.rect(screen, WHITE, self.rect, 3)
-
-class Balloon:
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.speed = random.uniform(1, 3)
-        self.sway = random.uniform(-1, 1)
-        self.string_length = random.randint(50, 100)
-    
-    def update(self):
-        self.y -= self.speed
-        self.x += self.sway * 0.5
-    
-    def draw(self, screen):
-        # Draw balloon
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), 20)
-        pygame.draw.circle(screen, BLACK, (int(self.x), int(self.y)), 20, 2)
-        # Draw string
-        pygame.draw.line(screen, BLACK, (self.x, self.y + 20), (self.x, self.y + self.string_length), 2)
+class QualityGovernor:
+    """Steps through quality levels to hold the frame rate on slow machines.
+    
+    observe() is fed each frame's work time, everything but the wait for the
+    frame cap. Once the average over a window of frames leaves less than
+    downgrade_headroom of the frame budget free, quality drops one level.
+    Once it has left more than upgrade_headroom free for upgrade_delay
+    frames in a row, quality climbs back one. The gap between the two
+    thresholds, judging each level only on its own frames, and doubling the
+    delay whenever an upgrade had to be undone keep it from see-sawing.
+    Every change is kept in decisions, and appended to log_path as JSON lines.
+    """
+    def __init__(self, target_fps=FPS, levels=QUALITY_LEVELS, window=30, downgrade_headroom=0.1,
+                 upgrade_headroom=0.4, upgrade_delay=180, log_path=None):
+        self.budget = 1.0 / target_fps
+        self.levels = levels
+        self.level = 0
+        self.window = window
+        self.downgrade_headroom = downgrade_headroom
+        self.upgrade_headroom = upgrade_headroom
+        self.upgrade_delay = upgrade_delay
+        self.log_path = log_path
+        self.decisions = []
+        self.frames = 0
+        self._samples = deque(maxlen=window)
+        self._calm_frames = 0  # Consecutive frames with room to spare
+    
+    @property
+    def settings(self):
+        return self.levels[self.level]
+    
+    def observe(self, work_seconds):
+        """Record one frame's work time, returning the new settings if the level changed, else None."""
+        self.frames += 1
+        self._samples.append(work_seconds)
+        if len(self._samples) < self.window:
+            return None
+        average = sum(self._samples) / len(self._samples)
+        headroom = 1.0 - average / self.budget
+        if headroom < self.downgrade_headroom:
+            self._calm_frames = 0
+            if self.level < len(self.levels) - 1:
+                return self._change(self.level + 1, average)
+            return None
+        self._calm_frames = self._calm_frames + 1 if headroom > self.upgrade_headroom else 0
+        if self._calm_frames >= self.upgrade_delay and self.level > 0:
+            return self._change(self.level - 1, average)
+        return None
+    
+    def _change(self, level, average):
+        last = self.decisions[-1] if self.decisions else None
+        if level > self.level and last is not None and last["level"] < last["from_level"]:
+            self.upgrade_delay *= 2  # The last upgrade didn't hold, so wait longer before the next
+        decision = {"frame": self.frames, "time": time.time(), "from_level": self.level, "level": level,
+                    "work_ms": average * 1000, "budget_ms": self.budget * 1000, **self.levels[level]}
+        self.decisions.append(decision)
+        if self.log_path:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(decision) + "\n")
+        self.level = level
+        self._samples.clear()  # Judge the new level on its own frames
+        self._calm_frames = 0
+        return self.settings
 
 class CarRacingGame:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    name_placeholder = "Enter your name"
+    max_name_length = 20
+    
+    def __init__(self, input_source=None, headless=False, seed=None, trace_path=None,
+                 course_length=FINISH_LINE_DISTANCE, dirty_rects=False, render_fps=FPS, vsync=False,
+                 tuning=None, leaderboard_url=None, record_results=True, adaptive_quality=ADAPTIVE_QUALITY,
+                 quality_log=None):
+        self.headless = headless
+        if headless:
+            # Open the display on SDL's dummy driver so no window or GPU is needed
+            pygame.display.quit()
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.display.init()
+        if vsync and not headless:
+            # Vsync needs a renderer-backed window, which pygame only gives SCALED displays
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SCALED, vsync=1)
+            render_fps = 0
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.render_fps = render_fps
+        self.vsync = vsync and not headless
         pygame.display.set_caption("Head-Controlled Car Racing")
         self.clock = pygame.time.Clock()
+        self.sprites = SpriteCache()
+        self.text = TextCache()
+        self._hud_fields = {}  # HUD field -> (value it was rendered for, surface)
+        
+        # Dirty-rect rendering: while racing, only changed regions are pushed to the display
+        self.dirty_rect_rendering = dirty_rects
+        self._frame_dirty = []
+        self._last_dirty = []
+        self._needs_full_update = True
+        self._hud_refresh = True
         self.font = pygame.font.Font(None, 36)
         self.big_font = pygame.font.Font(None, 72)
         
+        # Seeded so headless runs are reproducible; without a seed every race gets a new course
+        self.fixed_seed = seed is not None
+        self.seed = seed if self.fixed_seed else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.course_length = course_length  # None for an endless course
+        self.sim_time = 0.0
+        
         # Game state
         self.game_state = "start"  # "start", "playing", "finished", "game_over"
         self.player_name = ""
@@ -217,59 +2174,103 @@ class CarRacingGame:
         self.car_x = SCREEN_WIDTH // 2
         self.car_y = SCREEN_HEIGHT - 150
         self.car_speed = 0
-        self.max_speed = 8
-        self.min_speed = 1
+        tuning = resolve_tuning(tuning)
+        self.tuning = tuning
+        self.max_speed = tuning["max_speed"]
+        self.min_speed = tuning["min_speed"]
+        self.steer_sensitivity = tuning["steer_sensitivity"]
+        self.speed_sensitivity = tuning["speed_sensitivity"]
+        self.hurdle_spacing = tuning["hurdle_spacing"]
         self.road_offset = 0
         self.distance_traveled = 0
         
         # Head tracking
-        self.head_tracker = HeadTracker()
+        if input_source is None:
+            input_source = open_input_source("camera")
+        self.head_tracker = input_source
+        self.head_tracker.bind(self)
+        self.calibrations = None if headless else CalibrationStore()
+        
+        # Race history and leaderboard, written off the game loop
+        record_results = record_results and not headless
+        self.results = ResultsStore() if record_results else None
+        self.leaderboard_client = LeaderboardClient(leaderboard_url) if leaderboard_url and record_results else None
+        self.replay_recorder = None  # Set to a ReplayRecorder to save every race
+        self.previous_best = None  # Player's best before the race just finished
+        self.race_frames = 0
+        self.race_wall_start = 0.0
         
         # Environment objects
-        self.trees = []
-        self.houses = []
-        self.hurdles = []
-        self.balloons = []
+        self.world = WorldStore()
+        
+        # Particle effects: exhaust dust in the scene, balloons and confetti over the finish screen
+        self.effects = ParticleSystem(rng=np.random.default_rng(self.seed))
+        self.dust_styles = self.effects.add_styles([dust_style(shade) for shade in (110, 140, 170)])
+        self.celebration = ParticleSystem(rng=np.random.default_rng(self.seed + 1))
+        self.balloon_styles = self.celebration.add_styles([balloon_style(color, length) for color in CELEBRATION_COLORS
+                                                           for length in (60, 80, 100)])
+        self.confetti_styles = self.celebration.add_styles([confetti_style(color) for color in CELEBRATION_COLORS])
+        self._exhaust_due = 0.0  # Fractional dust particles carried over between frames
+        self.frame_dt = SIM_DT  # Wall time the last frame covered, for effects
         
         # Timing
         self.start_time = 0
         self.finish_time = 0
         
-        # Generate initial environment
-        self.generate_environment()
+        # Frame profiling (toggle the overlay with F3)
+        self.profiler = FrameProfiler(trace_path=trace_path)
+        self.show_profiler = False
         
-    def generate_environment(self):
-        # Generate trees on both sides
-        for i in range(100):
-            y_pos = -i * 200 - random.randint(0, 100)
-            # Left side trees
-            if random.random() < 0.7:
-                self.trees.append(Tree(50 + random.randint(0, 100), y_pos))
-            # Right side trees
-            if random.random() < 0.7:
-                self.trees.append(Tree(SCREEN_WIDTH - 150 + random.randint(0, 100), y_pos))
+        # Startup milestones in seconds since the process started, see report_startup
+        self.startup = {}
         
-        # Generate houses
-        for i in range(30):
-            y_pos = -i * 300 - random.randint(0, 200)
-            side = random.choice(["left", "right"])
-            if side == "left":
-                self.houses.append(House(100 + random.randint(0, 50), y_pos))
-            else:
-                self.houses.append(House(SCREEN_WIDTH - 200 + random.randint(0, 50), y_pos))
+        # Quality settings, lowered by the governor while frames run over budget
+        self.governor = None
+        if adaptive_quality and not headless:
+            self.governor = QualityGovernor(render_fps or FPS, log_path=quality_log)
+        self.hud_interval = 1  # HUD readouts re-render every this many frames
+        self.scenery_density = 1.0
+        self.particle_density = 1.0  # Scales how many particles effects emit
+        self.render_scale = 1.0  # Scene is drawn at this fraction of the window size, then scaled up
+        self._scene_surface = None
         
-        # Generate hurdles on the road
-        for i in range(20):
-            y_pos = -i * 400 - random.randint(200, 400)
-            lane = random.randint(0, 2)  # 3 lanes
-            x_pos = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2 + lane * LANE_WIDTH + LANE_WIDTH // 2 - 20
-            self.hurdles.append(Hurdle(x_pos, y_pos))
+        # Generate initial environment, off the main thread when there's a start screen to show first
+        self._course_thread = None
+        if headless:
+            self.generate_environment()
+        else:
+            self._course_thread = threading.Thread(target=self.generate_initial_course, name="CourseGenerator",
+                                                   daemon=True)
+            self._course_thread.start()
+        self.save_render_state()
+        
+    def generate_environment(self):
+        # Only the chunks near the start are built now, the rest stream in during the race
+        self.course = CourseGenerator(self.seed, self.course_length, hurdle_spacing=self.hurdle_spacing,
+                                      scenery_density=self.scenery_density)
+        self.course.fill(self.world)
+    
+    def generate_initial_course(self):
+        self.generate_environment()
+        self.startup["course"] = time.perf_counter() - PROCESS_START
+    
+    def course_ready(self):
+        return self._course_thread is None or not self._course_thread.is_alive()
+    
+    def wait_for_course(self):
+        if self._course_thread is not None:
+            self._course_thread.join()
+            self._course_thread = None
     
     def handle_input(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
             
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.show_profiler = not self.show_profiler
+                continue
+            
             if self.game_state == "start":
                 if event.type == pygame.KEYDOWN:
                     if self.input_active:
@@ -279,7 +2280,7 @@ class CarRacingGame:
                         elif event.key == pygame.K_BACKSPACE:
                             self.player_name = self.player_name[:-1]
                         else:
-                            if len(self.player_name) < 20:
+                            if len(self.player_name) < self.max_name_length:
                                 self.player_name += event.unicode
                 
                 if event.type == pygame.MOUSEBUTTONDOWN:
@@ -294,6 +2295,10 @@ class CarRacingGame:
                         if self.player_name.strip():
                             self.start_game()
             
+            elif self.game_state == "playing":
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_c:
+                    self.head_tracker.recalibrate()
+            
             elif self.game_state in ["finished", "game_over"]:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_SPACE:
@@ -301,12 +2306,82 @@ class CarRacingGame:
         
         return True
     
+    def now(self):
+        """Game clock: simulated time, so race times don't depend on frame rate."""
+        return self.sim_time
+    
     def start_game(self):
+        # Results and calibration are keyed by name, so stray spaces mustn't make a new player
+        self.player_name = self.player_name.strip()
+        self.wait_for_course()
+        self.load_calibration()
         self.game_state = "playing"
-        self.start_time = time.time()
+        self.start_time = self.now()
         self.car_speed = self.min_speed
+        self.race_frames = 0
+        self.race_wall_start = time.perf_counter()
+        if self.replay_recorder is not None:
+            self.replay_recorder.begin(self)
+        self.save_render_state()
+    
+    def load_calibration(self):
+        # Returning players start with their saved baseline, new ones calibrate from scratch
+        profile = self.calibrations.load(self.player_name) if self.calibrations else None
+        if profile is not None:
+            self.head_tracker.apply_calibration(profile)
+        else:
+            self.head_tracker.recalibrate()
+    
+    def restore_snapshot(self, snapshot):
+        """Put a race back in the state a replay snapshot recorded."""
+        self.game_state = "playing"
+        self.car_x = float(snapshot["car_x"])
+        self.car_speed = float(snapshot["car_speed"])
+        self.road_offset = float(snapshot["road_offset"])
+        self.distance_traveled = float(snapshot["distance"])
+        self.sim_time = float(snapshot["sim_time"])
+        self.start_time = float(snapshot["start_time"])
+        # The course is a function of the seed, so regenerating it up to the scroll restores the world
+        self.world.clear()
+        self.world.scroll = float(snapshot["scroll"])
+        self.generate_environment()
+        self.world.cull()
+        self.save_render_state()
+    
+    def render_state(self):
+        return self.car_x, self.road_offset, self.distance_traveled, self.world.scroll
+    
+    def save_render_state(self):
+        self._previous_render_state = self.render_state()
+    
+    @contextmanager
+    def interpolated(self, alpha):
+        """Temporarily place everything that scrolls or steers between the last two steps."""
+        if alpha >= 1.0:
+            yield
+            return
+        current = self.render_state()
+        previous = self._previous_render_state
+        blended = [p + (c - p) * alpha for p, c in zip(previous, current)]
+        self.car_x, self.road_offset, self.distance_traveled, self.world.scroll = blended
+        try:
+            yield
+        finally:
+            self.car_x, self.road_offset, self.distance_traveled, self.world.scroll = current
+    
+    def step(self, movement=None):
+        """Advance the simulation by one fixed timestep."""
+        self.save_render_state()
+        self.sim_time += SIM_DT
+        self.update_game(movement)
+    
+    def save_calibration(self):
+        if self.calibrations:
+            self.calibrations.save(self.player_name, self.head_tracker.calibration())
     
     def restart_game(self):
+        self.wait_for_course()
+        self.save_calibration()
         self.game_state = "start"
         self.player_name = ""
         self.input_active = False
@@ -314,22 +2389,34 @@ class CarRacingGame:
         self.car_speed = 0
         self.road_offset = 0
         self.distance_traveled = 0
-        self.balloons = []
+        self.effects.clear()
+        self.celebration.clear()
         # Regenerate environment
-        self.trees = []
-        self.houses = []
-        self.hurdles = []
+        if not self.fixed_seed:
+            self.seed = self.rng.randrange(2 ** 32)
+        self.world.clear()
         self.generate_environment()
     
-    def update_game(self):
+    def update_game(self, movement=None):
         if self.game_state != "playing":
             return
         
-        # Get head movement
-        horizontal_movement, vertical_movement = self.head_tracker.get_head_movement()
+        # Get head movement, unless the caller already sampled it for this frame
+        if movement is None:
+            with self.profiler.phase("tracking"):
+                movement = self.sample_movement()
+        self.apply_movement(movement)
+        if self.replay_recorder is not None:
+            self.replay_recorder.record_step(self, movement)
+    
+    def sample_movement(self):
+        return self.head_tracker.get_head_movement()
+    
+    def apply_movement(self, movement):
+        horizontal_movement, vertical_movement = movement
         
         # Update car horizontal position with enhanced sensitivity
-        car_move_x = horizontal_movement * 7  # Increased sensitivity
+        car_move_x = horizontal_movement * self.steer_sensitivity
         new_car_x = self.car_x + car_move_x
         
         # Keep car within road boundaries
@@ -340,7 +2427,7 @@ class CarRacingGame:
             self.car_x = new_car_x
         
         # Update car speed based on vertical movement with better responsiveness
-        speed_change = vertical_movement * 0.5  # Increased sensitivity
+        speed_change = vertical_movement * self.speed_sensitivity
         self.car_speed = max(self.min_speed, min(self.max_speed, self.car_speed + speed_change))
         
         # Update road offset and distance (synchronized with car speed)
@@ -348,44 +2435,111 @@ class CarRacingGame:
         self.road_offset += movement_speed
         self.distance_traveled += movement_speed
         
-        # Move all environment objects at the same speed as the road
-        for tree in self.trees:
-            tree.update_position(0, movement_speed)
-        
-        for house in self.houses:
-            house.update_position(0, movement_speed)
-        
-        for hurdle in self.hurdles:
-            hurdle.update_position(0, movement_speed)
+        # Scroll the world at the same speed as the road
+        self.world.advance(movement_speed)
         
         # Check collisions with hurdles
         car_rect = pygame.Rect(self.car_x - CAR_WIDTH // 2, self.car_y - CAR_HEIGHT // 2, CAR_WIDTH, CAR_HEIGHT)
-        for hurdle in self.hurdles[:]:  # Create copy for safe removal
-            if car_rect.colliderect(hurdle.rect):
-                self.game_state = "game_over"
-                return
+        if self.world.collides(self.world.hurdles, car_rect):
+            self.game_state = "game_over"
+            self.record_race()
+            return
         
-        # Remove objects that are too far behind
-        self.trees = [tree for tree in self.trees if tree.y < SCREEN_HEIGHT + 100]
-        self.houses = [house for house in self.houses if house.y < SCREEN_HEIGHT + 100]
-        self.hurdles = [hurdle for hurdle in self.hurdles if hurdle.y < SCREEN_HEIGHT + 100]
+        self.stream_course()
         
         # Check if finished
-        if self.distance_traveled >= FINISH_LINE_DISTANCE:
+        if self.course_length is not None and self.distance_traveled >= self.course_length:
             self.game_state = "finished"
-            self.finish_time = time.time()
-            # Create celebration balloons
-            for _ in range(50):
-                x = random.randint(50, SCREEN_WIDTH - 50)
-                y = SCREEN_HEIGHT + random.randint(0, 100)
-                color = random.choice([RED, BLUE, GREEN, YELLOW, (255, 0, 255), (255, 165, 0)])
-                self.balloons.append(Balloon(x, y, color))
+            self.finish_time = self.now()
+            self.record_race()
+            self.celebrate()
+    
+    def celebrate(self):
+        self.release_balloons(round(CELEBRATION_BALLOONS * self.particle_density))
+        self.burst_confetti(round(CELEBRATION_CONFETTI * self.particle_density))
+    
+    def release_balloons(self, count):
+        # Rising from below the screen, drifting a little to one side
+        rng = self.celebration.rng
+        self.celebration.emit(count, rng.choice(self.balloon_styles, count),
+                              x=rng.uniform(50, SCREEN_WIDTH - 50, count), y=SCREEN_HEIGHT + rng.uniform(0, 100, count),
+                              vx=rng.uniform(-30, 30, count), vy=-rng.uniform(60, 180, count),
+                              sway=rng.uniform(5, 20, count), life=30.0)
+    
+    def burst_confetti(self, count):
+        # Fired up and inwards from both sides, then fluttering down
+        rng = self.celebration.rng
+        side = np.where(rng.random(count) < 0.5, -1.0, 1.0)
+        self.celebration.emit(count, rng.choice(self.confetti_styles, count),
+                              x=SCREEN_WIDTH / 2 + side * (SCREEN_WIDTH / 2 - 20), y=SCREEN_HEIGHT * 0.7,
+                              vx=-side * rng.uniform(150, 650, count), vy=-rng.uniform(350, 950, count),
+                              gravity=600.0, drag=1.5, sway=rng.uniform(20, 60, count), life=rng.uniform(3, 6, count))
+    
+    def apply_quality(self, settings):
+        self.hud_interval = settings["hud_interval"]
+        self.head_tracker.set_detection_interval(settings["detect_interval"])
+        # Chunks already generated keep their scenery, the thinning shows up as new ones stream in
+        self.scenery_density = settings["scenery_density"]
+        self.course.scenery_density = self.scenery_density
+        self.particle_density = settings["particles"]
+        # Fewer live particles, not just fewer new ones, so a celebration already running gets cheaper too
+        for system in (self.effects, self.celebration):
+            system.set_limit(round(len(system.particles) * self.particle_density))
+        self.render_scale = settings["render_scale"]
+    
+    def stream_course(self):
+        # Stream in the course ahead and remove objects that are too far behind
+        self.course.fill(self.world)
+        self.world.cull()
+    
+    def record_race(self):
+        if self.results is None and self.leaderboard_client is None:
+            return
+        wall_time = time.perf_counter() - self.race_wall_start
+        race = {
+            "id": uuid.uuid4().hex,  # Lets the leaderboard service drop resubmitted races
+            "player": self.player_name,
+            "seed": self.seed,
+            "race_time": self.now() - self.start_time,
+            "distance": self.distance_traveled,
+            "collisions": 1 if self.game_state == "game_over" else 0,
+            "finished": int(self.game_state == "finished"),
+            "avg_fps": self.race_frames / wall_time if wall_time > 0 else 0.0,
+            "recorded_at": time.time(),
+        }
+        if self.results is not None:
+            self.previous_best = self.results.best(self.player_name)
+            self.results.record(race)
+        if self.leaderboard_client is not None:
+            self.leaderboard_client.submit(race)
+    
+    def draw_leaderboard(self, top):
+        # The shared board once it's been fetched, this machine's until then
+        entries = self.leaderboard_client.leaderboard() if self.leaderboard_client else None
+        if entries is None:
+            entries = self.results.leaderboard() if self.results else []
+        if not entries:
+            return
+        title = self.text.render(self.font, "Leaderboard", BLACK if self.game_state == "start" else WHITE)
+        self.screen.blit(title, title.get_rect(center=(SCREEN_WIDTH // 2, top)))
+        for i, (player, race_time) in enumerate(entries):
+            color = YELLOW if player == self.player_name and self.game_state != "start" else GRAY
+            text = self.text.render(self.font, f"{i + 1}. {player}  {race_time:.2f}s", color)
+            self.screen.blit(text, text.get_rect(center=(SCREEN_WIDTH // 2, top + 35 + i * 30)))
+    
+    def report_startup(self):
+        camera = getattr(self.head_tracker, "startup_seconds", None)
+        milestones = sorted(self.startup.items(), key=lambda item: item[1])
+        parts = [f"{name} at {seconds * 1000:.0f} ms" for name, seconds in milestones]
+        if camera is not None:
+            parts.append(f"camera opened in {camera * 1000:.0f} ms")
+        print("Startup: " + ", ".join(parts))
     
     def draw_start_screen(self):
         self.screen.fill(WHITE)
         
         # Title
-        title_text = self.big_font.render("Head-Controlled Racing", True, BLACK)
+        title_text = self.text.render(self.big_font, "Head-Controlled Racing", BLACK)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 150))
         self.screen.blit(title_text, title_rect)
         
@@ -398,7 +2552,7 @@ class CarRacingGame:
         ]
         
         for i, instruction in enumerate(instructions):
-            text = self.font.render(instruction, True, BLACK)
+            text = self.text.render(self.font, instruction, BLACK)
             text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, 200 + i * 30))
             self.screen.blit(text, text_rect)
         
@@ -407,12 +2561,12 @@ class CarRacingGame:
         pygame.draw.rect(self.screen, BLACK, (SCREEN_WIDTH // 2 - 150, 300, 300, 50), 2)
         
         # Input text
-        input_text = self.font.render(self.player_name, True, BLACK)
+        input_text = self.text.render(self.font, self.player_name, BLACK)
         self.screen.blit(input_text, (SCREEN_WIDTH // 2 - 140, 315))
         
         # Placeholder text
         if not self.player_name:
-            placeholder = self.font.render("Enter your name", True, GRAY)
+            placeholder = self.text.render(self.font, self.name_placeholder, GRAY)
             self.screen.blit(placeholder, (SCREEN_WIDTH // 2 - 140, 315))
         
         # Play button
@@ -420,202 +2574,1370 @@ class CarRacingGame:
         pygame.draw.rect(self.screen, button_color, (SCREEN_WIDTH // 2 - 100, 400, 200, 50))
         pygame.draw.rect(self.screen, BLACK, (SCREEN_WIDTH // 2 - 100, 400, 200, 50), 2)
         
-        play_text = self.font.render("PLAY", True, BLACK)
+        play_text = self.text.render(self.font, "PLAY", BLACK)
         play_rect = play_text.get_rect(center=(SCREEN_WIDTH // 2, 425))
         self.screen.blit(play_text, play_rect)
+        
+        # Returning player's best time
+        best = self.results.best(self.player_name.strip()) if self.results else None  # Keyed as start_game will store it
+        if best is not None:
+            best_text = self.text.render(self.font, f"Your best: {best:.2f}s", DARK_GRAY)
+            self.screen.blit(best_text, best_text.get_rect(center=(SCREEN_WIDTH // 2, 375)))
+        
+        self.draw_leaderboard(500)
+        
+        # Startup progress, while the camera and course come up in the background
+        camera = self.head_tracker.status()
+        course = "ready" if self.course_ready() else "starting"
+        for i, (name, status) in enumerate((("Camera", camera), ("Course", course))):
+            text = self.text.render(self.font, f"{name}: {STATUS_LABELS[status]}", STATUS_COLORS[status])
+            self.screen.blit(text, (20, SCREEN_HEIGHT - 70 + i * 30))
     
     def draw_road(self):
+        self.sprites.validate(self.screen)
+        scale = self.sprites.scale
+        road_left = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2
+        
+        # Static grass and road, restored only under last frame's sprites when using dirty rects
+        background, _ = self.sprites.get("background", (SCREEN_WIDTH, SCREEN_HEIGHT), self.paint_background, opaque=True)
+        if self.dirty_rects_active() and not self._needs_full_update:
+            for rect in self._last_dirty:
+                self.screen.blit(background, rect, rect)
+        else:
+            self.screen.blit(background, (0, 0))
+        
+        # Road strip with lane dividers, one dash period taller than the screen so it can scroll
+        dash_period = 60
+        strip, _ = self.sprites.get("road_strip", (ROAD_WIDTH, SCREEN_HEIGHT + dash_period),
+                                    self.paint_road_strip, opaque=True)
+        dash_offset = int(self.road_offset) % dash_period
+        self.screen.blit(strip, (road_left * scale, -dash_offset * scale))
+        self.mark_dirty(pygame.Rect(road_left, 0, ROAD_WIDTH, SCREEN_HEIGHT))
+        
+        # Draw finish line if close
+        if self.course_length is None:
+            return
+        finish_line_y = SCREEN_HEIGHT - (self.course_length - self.distance_traveled)
+        if finish_line_y > -50 and finish_line_y < SCREEN_HEIGHT + 50:
+            self.sprites.validate(self.screen)
+            square_size = 20
+            sprite, _ = self.sprites.get("finish_line", ((ROAD_WIDTH // square_size + 1) * square_size, 3 * square_size),
+                                         lambda surface: self.paint_finish_line(surface, 0, 0), opaque=True)
+            self.mark_dirty(self.screen.blit(sprite, (road_left * scale, (finish_line_y - square_size) * scale)))
+    
+    @staticmethod
+    def paint_background(surface):
         # Draw grass background
-        self.screen.fill(GREEN)
+        surface.fill(GREEN)
         
         # Draw road
         road_left = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2
-        road_right = SCREEN_WIDTH // 2 + ROAD_WIDTH // 2
-        pygame.draw.rect(self.screen, DARK_GRAY, (road_left, 0, ROAD_WIDTH, SCREEN_HEIGHT))
+        pygame.draw.rect(surface, DARK_GRAY, (road_left, 0, ROAD_WIDTH, SCREEN_HEIGHT))
+    
+    @staticmethod
+    def paint_road_strip(surface):
+        surface.fill(DARK_GRAY)
         
         # Draw lane dividers
         lane_divider_width = 4
         for i in range(1, 3):
-            x = road_left + i * LANE_WIDTH
+            x = i * LANE_WIDTH
             # Dashed lines
             dash_length = 40
             gap_length = 20
             total_length = dash_length + gap_length
-            
-            # Calculate offset for moving dashes
-            dash_offset = int(self.road_offset) % total_length
-            
-            for y in range(-dash_offset, SCREEN_HEIGHT + total_length, total_length):
-                if y + dash_length > 0:
-                    dash_rect = pygame.Rect(x - lane_divider_width // 2, y, lane_divider_width, dash_length)
-                    pygame.draw.rect(self.screen, WHITE, dash_rect)
-        
-        # Draw finish line if close
-        finish_line_y = SCREEN_HEIGHT - (FINISH_LINE_DISTANCE - self.distance_traveled)
-        if finish_line_y > -50 and finish_line_y < SCREEN_HEIGHT + 50:
-            # Checkered pattern
-            square_size = 20
-            for i in range(ROAD_WIDTH // square_size + 1):
-                for j in range(3):
-                    x = road_left + i * square_size
-                    y = finish_line_y + j * square_size - square_size
-                    color = BLACK if (i + j) % 2 == 0 else WHITE
-                    pygame.draw.rect(self.screen, color, (x, y, square_size, square_size))
+            for y in range(0, surface.get_height(), total_length):
+                dash_rect = pygame.Rect(x - lane_divider_width // 2, y, lane_divider_width, dash_length)
+                pygame.draw.rect(surface, WHITE, dash_rect)
+    
+    @staticmethod
+    def paint_finish_line(surface, left, top):
+        # Checkered pattern
+        square_size = 20
+        for i in range(ROAD_WIDTH // square_size + 1):
+            for j in range(3):
+                x = left + i * square_size
+                y = top + j * square_size
+                color = BLACK if (i + j) % 2 == 0 else WHITE
+                pygame.draw.rect(surface, color, (x, y, square_size, square_size))
     
     def draw_environment(self):
-        # Draw all environment objects
-        for tree in self.trees:
-            if -100 <= tree.y <= SCREEN_HEIGHT + 100:
-                tree.draw(self.screen)
-        
-        for house in self.houses:
-            if -100 <= house.y <= SCREEN_HEIGHT + 100:
-                house.draw(self.screen)
-        
-        for hurdle in self.hurdles:
-            if -100 <= hurdle.y <= SCREEN_HEIGHT + 100:
-                hurdle.draw(self.screen)
+        # Draw all environment objects as one batch of sprite blits
+        self.sprites.validate(self.screen)
+        scale = self.sprites.scale
+        batch = []
+        for layer in self.world.layers:
+            sprite, (ox, oy) = self.sprites.kind(layer.kind)
+            xs = layer.x
+            ys = self.world.screen_y(layer)
+            if scale != 1.0:
+                xs, ys = xs * scale, ys * scale
+            for i in self.world.visible(layer):
+                batch.append((sprite, (xs[i] + ox, ys[i] + oy)))
+        if self.dirty_rects_active():
+            self._frame_dirty.extend(self.screen.blits(batch))
+        else:
+            self.screen.blits(batch, doreturn=False)
+    
+    def draw_effects(self):
+        # Dust from both exhausts while racing, left behind as the road scrolls, more the faster we go
+        if self.game_state == "playing":
+            self._exhaust_due += EXHAUST_RATE * self.particle_density * self.car_speed / self.max_speed * self.frame_dt
+            count = int(self._exhaust_due)
+            self._exhaust_due -= count
+            if count:
+                rng = self.effects.rng
+                pipe = np.where(rng.random(count) < 0.5, -1.0, 1.0) * (CAR_WIDTH // 2 - 12)
+                self.effects.emit(count, rng.choice(self.dust_styles, count), x=self.car_x + pipe,
+                                  y=self.car_y + CAR_HEIGHT // 2, vx=rng.uniform(-20, 20, count),
+                                  vy=self.car_speed * SIM_HZ * rng.uniform(0.6, 1.0, count),
+                                  life=rng.uniform(0.4, 0.8, count))
+        self.effects.update(self.frame_dt)
+        if self.dirty_rects_active():
+            self._frame_dirty.extend(self.effects.draw(self.screen, self.sprites, collect_rects=True))
+        else:
+            self.effects.draw(self.screen, self.sprites)
     
     def draw_car(self):
+        self.sprites.validate(self.screen)
+        sprite, _ = self.sprites.get("car", (CAR_WIDTH, CAR_HEIGHT),
+                                     lambda surface: self.paint_car(surface, CAR_WIDTH // 2, CAR_HEIGHT // 2), opaque=True)
+        scale = self.sprites.scale
+        self.mark_dirty(self.screen.blit(sprite, (round((self.car_x - CAR_WIDTH // 2) * scale),
+                                                  round((self.car_y - CAR_HEIGHT // 2) * scale))))
+    
+    @staticmethod
+    def paint_car(surface, car_x, car_y):
         # Draw car body
-        car_rect = pygame.Rect(self.car_x - CAR_WIDTH // 2, self.car_y - CAR_HEIGHT // 2, CAR_WIDTH, CAR_HEIGHT)
-        pygame.draw.rect(self.screen, BLUE, car_rect)
-        pygame.draw.rect(self.screen, BLACK, car_rect, 3)
+        car_rect = pygame.Rect(car_x - CAR_WIDTH // 2, car_y - CAR_HEIGHT // 2, CAR_WIDTH, CAR_HEIGHT)
+        pygame.draw.rect(surface, BLUE, car_rect)
+        pygame.draw.rect(surface, BLACK, car_rect, 3)
         
         # Draw car windows
-        window_rect = pygame.Rect(self.car_x - CAR_WIDTH // 2 + 10, self.car_y - CAR_HEIGHT // 2 + 10, CAR_WIDTH - 20, 30)
-        pygame.draw.rect(self.screen, (135, 206, 235), window_rect)
+        window_rect = pygame.Rect(car_x - CAR_WIDTH // 2 + 10, car_y - CAR_HEIGHT // 2 + 10, CAR_WIDTH - 20, 30)
+        pygame.draw.rect(surface, (135, 206, 235), window_rect)
         
         # Draw wheels
         wheel_size = 12
-        pygame.draw.circle(self.screen, BLACK, (int(self.car_x - CAR_WIDTH // 2 + 15), int(self.car_y + CAR_HEIGHT // 2 - 15)), wheel_size)
-        pygame.draw.circle(self.screen, BLACK, (int(self.car_x + CAR_WIDTH // 2 - 15), int(self.car_y + CAR_HEIGHT // 2 - 15)), wheel_size)
-        pygame.draw.circle(self.screen, BLACK, (int(self.car_x - CAR_WIDTH // 2 + 15), int(self.car_y - CAR_HEIGHT // 2 + 15)), wheel_size)
-        pygame.draw.circle(self.screen, BLACK, (int(self.car_x + CAR_WIDTH // 2 - 15), int(self.car_y - CAR_HEIGHT // 2 + 15)), wheel_size)
+        pygame.draw.circle(surface, BLACK, (int(car_x - CAR_WIDTH // 2 + 15), int(car_y + CAR_HEIGHT // 2 - 15)), wheel_size)
+        pygame.draw.circle(surface, BLACK, (int(car_x + CAR_WIDTH // 2 - 15), int(car_y + CAR_HEIGHT // 2 - 15)), wheel_size)
+        pygame.draw.circle(surface, BLACK, (int(car_x - CAR_WIDTH // 2 + 15), int(car_y - CAR_HEIGHT // 2 + 15)), wheel_size)
+        pygame.draw.circle(surface, BLACK, (int(car_x + CAR_WIDTH // 2 - 15), int(car_y - CAR_HEIGHT // 2 + 15)), wheel_size)
+    
+    def hud_text(self, field, value, template, color=WHITE):
+        """Surface for a HUD field, re-rendered only when its (quantized) value changes."""
+        cached = self._hud_fields.get(field)
+        if cached is not None and (cached[0] == (value, color) or not self._hud_refresh):
+            return cached[1]
+        surface = self.text.render(self.font, template.format(value), color)
+        self._hud_fields[field] = ((value, color), surface)
+        return surface
     
     def draw_ui(self):
         if self.game_state == "playing":
-            # Create semi-transparent background for UI elements
-            ui_surface = pygame.Surface((300, 200))
-            ui_surface.set_alpha(180)
-            ui_surface.fill(BLACK)
-            self.screen.blit(ui_surface, (5, 5))
+            # Semi-transparent background for UI elements, built once
+            self.sprites.validate(self.screen)
+            ui_surface, _ = self.sprites.get("hud_panel", (300, 200), lambda surface: surface.fill(BLACK),
+                                             opaque=True, alpha=180)
+            self.mark_dirty(self.screen.blit(ui_surface, (5, 5)))
             
+            # Numbers are rounded to their displayed precision so unchanged readouts are free
             # Speed indicator
-            speed_text = self.font.render(f"Speed: {self.car_speed:.1f}", True, WHITE)
-            self.screen.blit(speed_text, (15, 15))
+            speed_text = self.hud_text("speed", round(self.car_speed, 1), "Speed: {:.1f}")
+            self.mark_dirty(self.screen.blit(speed_text, (15, 15)))
             
             # Time
-            elapsed_time = time.time() - self.start_time
-            time_text = self.font.render(f"Time: {elapsed_time:.1f}s", True, WHITE)
-            self.screen.blit(time_text, (15, 50))
+            elapsed_time = self.now() - self.start_time
+            time_text = self.hud_text("time", round(elapsed_time, 1), "Time: {:.1f}s")
+            self.mark_dirty(self.screen.blit(time_text, (15, 50)))
             
             # Distance progress
-            progress = (self.distance_traveled / FINISH_LINE_DISTANCE) * 100
-            progress_text = self.font.render(f"Progress: {progress:.1f}%", True, WHITE)
-            self.screen.blit(progress_text, (15, 85))
+            if self.course_length is None:
+                progress_text = self.hud_text("progress", round(self.distance_traveled), "Distance: {:.0f}")
+            else:
+                progress = (self.distance_traveled / self.course_length) * 100
+                progress_text = self.hud_text("progress", round(progress, 1), "Progress: {:.1f}%")
+            self.mark_dirty(self.screen.blit(progress_text, (15, 85)))
             
             # Player name
-            name_text = self.font.render(f"Player: {self.player_name}", True, WHITE)
-            self.screen.blit(name_text, (15, 120))
+            name_text = self.hud_text("name", self.player_name, "Player: {}")
+            self.mark_dirty(self.screen.blit(name_text, (15, 120)))
             
             # Head tracking status
-            if self.head_tracker.frame_count < self.head_tracker.calibration_frames:
-                calib_progress = (self.head_tracker.frame_count / self.head_tracker.calibration_frames) * 100
-                calib_text = self.font.render(f"Calibrating: {calib_progress:.0f}%", True, YELLOW)
-                self.screen.blit(calib_text, (15, 155))
-            else:
-                ready_text = self.font.render("Head Tracking: READY", True, GREEN)
-                self.screen.blit(ready_text, (15, 155))
+            status_text = self.tracking_status_text("tracking", self.head_tracker)
+            if status_text is None:
+                status_text = self.hud_text("tracking", None, "Head Tracking: READY", GREEN)
+            self.mark_dirty(self.screen.blit(status_text, (15, 155)))
     
-    def draw_finished_screen(self):
-        # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(128)
-        overlay.fill(BLACK)
+    def tracking_status_text(self, field, source):
+        """HUD line for a source that isn't steering yet (camera starting or calibrating), else None."""
+        status = source.status()
+        if status != "ready":
+            return self.hud_text(field, status, "Camera: " + STATUS_LABELS[status], STATUS_COLORS[status])
+        if source.frame_count < source.calibration_frames:
+            calib_progress = (source.frame_count / source.calibration_frames) * 100
+            return self.hud_text(field, round(calib_progress), "Calibrating: {:.0f}%", YELLOW)
+        return None
+    
+    def draw_end_overlay(self):
+        # Semi-transparent overlay, built once
+        self.sprites.validate(self.screen)
+        overlay, _ = self.sprites.get("end_overlay", (SCREEN_WIDTH, SCREEN_HEIGHT), lambda surface: surface.fill(BLACK),
+                                      opaque=True, alpha=128)
         self.screen.blit(overlay, (0, 0))
-        
-        # Update and draw balloons
-        for balloon in self.balloons[:]:
-            balloon.update()
-            if balloon.y > -50:
-                balloon.draw(self.screen)
-            else:
-                self.balloons.remove(balloon)
+    
+    def dirty_rects_active(self):
+        # A scene drawn at a reduced scale is scaled onto the whole window, so every pixel changes
+        return self.dirty_rect_rendering and self.render_scale == 1.0
+    
+    def mark_dirty(self, rect):
+        if self.dirty_rects_active():
+            self._frame_dirty.append(rect)
+    
+    def present(self):
+        """Push the frame to the display, only the dirty regions when that's safe."""
+        if self.dirty_rects_active() and self.game_state == "playing" and not self._needs_full_update:
+            screen_rect = self.screen.get_rect()
+            # Last frame's regions were restored this frame, so they need pushing too
+            pygame.display.update([rect.clip(screen_rect) for rect in self._last_dirty + self._frame_dirty])
+        else:
+            pygame.display.flip()
+        self._last_dirty = self._frame_dirty
+        self._frame_dirty = []
+        self._needs_full_update = self.game_state != "playing" or self.render_scale != 1.0
+    
+    def draw_celebration(self):
+        self.celebration.update(self.frame_dt)
+        self.celebration.draw(self.screen, self.sprites)
+    
+    def draw_finished_screen(self):
+        self.draw_end_overlay()
+        self.draw_celebration()
         
         # Victory message
-        victory_text = self.big_font.render("CONGRATULATIONS!", True, WHITE)
+        victory_text = self.text.render(self.big_font, "CONGRATULATIONS!", WHITE)
         victory_rect = victory_text.get_rect(center=(SCREEN_WIDTH // 2, 200))
         self.screen.blit(victory_text, victory_rect)
         
         # Player name
-        name_text = self.font.render(f"{self.player_name} finished the race!", True, WHITE)
+        name_text = self.text.render(self.font, f"{self.player_name} finished the race!", WHITE)
         name_rect = name_text.get_rect(center=(SCREEN_WIDTH // 2, 280))
         self.screen.blit(name_text, name_rect)
         
         # Time
         total_time = self.finish_time - self.start_time
-        time_text = self.font.render(f"Your time: {total_time:.2f} seconds", True, WHITE)
+        time_text = self.text.render(self.font, f"Your time: {total_time:.2f} seconds", WHITE)
         time_rect = time_text.get_rect(center=(SCREEN_WIDTH // 2, 320))
         self.screen.blit(time_text, time_rect)
         
+        # Personal best, from before this race was written
+        if self.results is not None:
+            if self.previous_best is None or total_time < self.previous_best:
+                best_text = self.text.render(self.font, "New personal best!", YELLOW)
+            else:
+                best_text = self.text.render(self.font, f"Personal best: {self.previous_best:.2f} seconds", WHITE)
+            self.screen.blit(best_text, best_text.get_rect(center=(SCREEN_WIDTH // 2, 360)))
+        
         # Restart instruction
-        restart_text = self.font.render("Press SPACE to play again", True, WHITE)
+        restart_text = self.text.render(self.font, "Press SPACE to play again", WHITE)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, 400))
         self.screen.blit(restart_text, restart_rect)
+        
+        self.draw_leaderboard(480)
     
     def draw_game_over_screen(self):
-        # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(128)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.draw_end_overlay()
         
         # Game over message
-        game_over_text = self.big_font.render("GAME OVER!", True, RED)
+        game_over_text = self.text.render(self.big_font, "GAME OVER!", RED)
         game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, 300))
         self.screen.blit(game_over_text, game_over_rect)
         
         # Restart instruction
-        restart_text = self.font.render("Press SPACE to try again", True, WHITE)
+        restart_text = self.text.render(self.font, "Press SPACE to try again", WHITE)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, 400))
         self.screen.blit(restart_text, restart_rect)
     
+    def draw_frame(self):
+        if self.game_state == "start":
+            self.draw_start_screen()
+            return
+        with self.scene_target():
+            self.draw_road()
+            self.draw_environment()
+            self.draw_effects()
+            self.draw_car()
+        # Text and overlays are drawn at full resolution on top of the scaled scene
+        if self.game_state == "playing":
+            self.draw_ui()
+        elif self.game_state == "finished":
+            self.draw_finished_screen()
+        elif self.game_state == "game_over":
+            self.draw_game_over_screen()
+    
+    def scene_size(self):
+        return round(SCREEN_WIDTH * self.render_scale), round(SCREEN_HEIGHT * self.render_scale)
+    
+    @contextmanager
+    def scene_target(self):
+        """Point the scene passes at an offscreen surface at render_scale, then scale it onto the screen."""
+        if self.render_scale == 1.0:
+            yield
+            return
+        if self._scene_surface is None or self._scene_surface.get_size() != self.scene_size():
+            self._scene_surface = pygame.Surface(self.scene_size()).convert()
+        screen, self.screen = self.screen, self._scene_surface
+        try:
+            yield
+        finally:
+            self.screen = screen
+        # Nearest-neighbour, the cheapest way back up to the window size
+        pygame.transform.scale(self._scene_surface, (SCREEN_WIDTH, SCREEN_HEIGHT), self.screen)
+    
     def run(self):
         running = True
         
+        profiler = self.profiler
+        accumulator = 0.0
+        last_frame = time.perf_counter()
         while running:
-            running = self.handle_input()
+            profiler.begin_frame()
+            frame_start = time.perf_counter()
+            frame_time = frame_start - last_frame
+            last_frame = frame_start
+            self.frame_dt = min(frame_time, MAX_CATCHUP_STEPS * SIM_DT)
             
-            if self.game_state == "start":
-                self.draw_start_screen()
-            elif self.game_state == "playing":
-                self.update_game()
+            with profiler.phase("input"):
+                running = self.handle_input()
+            
+            # Fixed-timestep simulation: run as many steps as real time calls for, sampling
+            # the tracker once per frame so a slow camera can't hold up the catch-up steps
+            alpha = 1.0
+            if self.game_state == "playing":
+                accumulator += frame_time
+                if accumulator >= SIM_DT:
+                    with profiler.phase("tracking"):
+                        movement = self.sample_movement()
+                    with profiler.phase("simulation"):
+                        steps = 0
+                        while accumulator >= SIM_DT and steps < MAX_CATCHUP_STEPS and self.game_state == "playing":
+                            self.step(movement)
+                            accumulator -= SIM_DT
+                            steps += 1
+                    if steps == MAX_CATCHUP_STEPS:
+                        accumulator = min(accumulator, SIM_DT)  # Drop the backlog rather than spiral
+                alpha = min(1.0, accumulator / SIM_DT)
+            else:
+                accumulator = 0.0
+            
+            self._hud_refresh = self.race_frames % self.hud_interval == 0
+            with profiler.phase("draw"), self.interpolated(alpha):
+                self.draw_frame()
+                if self.show_profiler:
+                    self.mark_dirty(profiler.draw_overlay(self.screen, self.font, self.sprites, self.text))
+            
+            # With vsync the flip waits for the display, so it isn't work the governor can shed
+            work = time.perf_counter() - frame_start
+            with profiler.phase("flip"):
+                self.present()
+            if not self.vsync:
+                work = time.perf_counter() - frame_start
+            if self.game_state == "playing":
+                self.race_frames += 1  # For the average FPS saved with the race
+                if self.governor is not None:
+                    settings = self.governor.observe(work)
+                    if settings is not None:
+                        self.apply_quality(settings)
+            if "first_frame" not in self.startup:
+                self.startup["first_frame"] = time.perf_counter() - PROCESS_START
+                print(f"Time to first frame: {self.startup['first_frame'] * 1000:.0f} ms")
+            with profiler.phase("wait"):
+                self.clock.tick(self.render_fps)
+            profiler.end_frame()
+        
+        profiler.close()
+        if self.game_state != "start":
+            self.save_calibration()
+        if self.results is not None:
+            self.results.close()
+        if self.leaderboard_client is not None:
+            self.leaderboard_client.close()
+        
+        self.report_startup()
+        if self.governor is not None and self.governor.decisions:
+            print(f"Quality: {len(self.governor.decisions)} changes, ended at level {self.governor.level} "
+                  f"of {len(self.governor.levels) - 1}")
+        for stage, stats in self.head_tracker.latency_report().items():
+            print(f"Tracker {stage}: {stats['mean_ms']:.2f} ms mean, "
+                  f"{stats['max_ms']:.2f} ms max over {stats['count']} frames")
+        self.head_tracker.release()
+        pygame.quit()
+    
+    def run_headless(self, max_steps=100000, dt=SIM_DT, render=False):
+        """Race to completion on a fixed timestep without a window, returning the outcome."""
+        self.player_name = self.player_name or "headless"
+        self.start_game()
+        steps = 0
+        while self.game_state == "playing" and steps < max_steps:
+            self.sim_time += dt
+            self.update_game()
+            if render:
                 self.draw_road()
                 self.draw_environment()
+                self.draw_effects()
                 self.draw_car()
                 self.draw_ui()
-            elif self.game_state == "finished":
-                self.draw_road()
-                self.draw_environment()
-                self.draw_car()
-                self.draw_finished_screen()
-            elif self.game_state == "game_over":
+            steps += 1
+        
+        race_time = (self.finish_time if self.game_state == "finished" else self.now()) - self.start_time
+        return {
+            "seed": self.seed,
+            "state": self.game_state,
+            "steps": steps,
+            "distance": self.distance_traveled,
+            "race_time": race_time,
+            "collisions": 1 if self.game_state == "game_over" else 0,
+        }
+
+class Racer:
+    """One split-screen player's car and race, swapped into the game while it's their turn."""
+    def __init__(self, source, player_name, car_speed=0):
+        self.source = source
+        self.player_name = player_name
+        self.car_x = SCREEN_WIDTH // 2
+        self.car_speed = car_speed
+        self.road_offset = 0
+        self.distance_traveled = 0
+        self.game_state = "playing"
+        self.finish_time = 0
+        self.previous_best = None
+
+class SplitScreenGame(CarRacingGame):
+    """2-4 players racing the same course, each in their own viewport.
+    
+    Every step applies the single-player rules to each racer in turn, with
+    that racer's state swapped into the game (see racing_as), so the world,
+    course and clock are shared and only the cars differ. Each viewport is
+    drawn as a full single-player frame offscreen, then cropped and scaled
+    into its part of the window. The race ends when every racer has crashed
+    or finished.
+    """
+    name_placeholder = "Names, comma separated"
+    max_name_length = 60
+    
+    def __init__(self, input_sources, **kwargs):
+        # Viewports redraw the whole window every frame, so dirty rects would save nothing
+        super().__init__(InputGroup(input_sources), dirty_rects=False, **kwargs)
+        self.racers = []
+        self.current_racer = None
+        self.view_surface = None
+    
+    def racer_names(self):
+        names = [name.strip() for name in self.player_name.split(",")]
+        sources = self.head_tracker.sources
+        return [names[i] if i < len(names) and names[i] else f"Player {i + 1}" for i in range(len(sources))]
+    
+    @contextmanager
+    def racing_as(self, racer):
+        """Temporarily make racer's car the game's car, so the single-player rules apply to it."""
+        shared = (self.car_x, self.car_speed, self.road_offset, self.distance_traveled, self.game_state,
+                  self.finish_time, self.player_name, self.previous_best, self.head_tracker, self.world.scroll)
+        self.car_x, self.car_speed, self.road_offset, self.distance_traveled = (
+            racer.car_x, racer.car_speed, racer.road_offset, racer.distance_traveled)
+        self.game_state, self.finish_time, self.player_name, self.previous_best, self.head_tracker = (
+            racer.game_state, racer.finish_time, racer.player_name, racer.previous_best, racer.source)
+        self.world.scroll = racer.distance_traveled
+        self.current_racer = racer
+        try:
+            yield
+        finally:
+            self.current_racer = None
+            racer.car_x, racer.car_speed, racer.road_offset, racer.distance_traveled = (
+                self.car_x, self.car_speed, self.road_offset, self.distance_traveled)
+            racer.game_state, racer.finish_time, racer.previous_best = (
+                self.game_state, self.finish_time, self.previous_best)
+            (self.car_x, self.car_speed, self.road_offset, self.distance_traveled, self.game_state,
+             self.finish_time, self.player_name, self.previous_best, self.head_tracker, self.world.scroll) = shared
+    
+    def start_game(self):
+        self.racers = [Racer(source, name, self.min_speed)
+                       for source, name in zip(self.head_tracker.sources, self.racer_names())]
+        super().start_game()
+    
+    def load_calibration(self):
+        for racer in self.racers:
+            with self.racing_as(racer):
+                super().load_calibration()
+    
+    def save_calibration(self):
+        for racer in self.racers:
+            with self.racing_as(racer):
+                super().save_calibration()
+    
+    def restart_game(self):
+        super().restart_game()
+        self.racers = []
+    
+    @contextmanager
+    def interpolated(self, alpha):
+        # Racers step together and the world is shared, so frames show the latest step as is
+        yield
+    
+    def update_game(self, movement=None):
+        if self.game_state != "playing":
+            return
+        
+        # One movement per racer, from the group's sources
+        if movement is None:
+            with self.profiler.phase("tracking"):
+                movement = self.sample_movement()
+        for racer, racer_movement in zip(self.racers, movement):
+            if racer.game_state == "playing":
+                with self.racing_as(racer):
+                    self.apply_movement(racer_movement)
+        
+        if all(racer.game_state != "playing" for racer in self.racers):
+            self.game_state = "finished" if any(racer.game_state == "finished" for racer in self.racers) else "game_over"
+    
+    def sample_movement(self):
+        # Each source is read with its racer swapped in, so policies that look at the game see their own car
+        movement = []
+        for racer in self.racers:
+            with self.racing_as(racer):
+                movement.append(racer.source.get_head_movement())
+        return movement
+    
+    def stream_course(self):
+        # The leader generates the course ahead; only what the last car has passed is culled
+        self.course.fill(self.world)
+        # The racer being stepped is only written back when racing_as exits, so read its distance live
+        trailing = min(self.distance_traveled if racer is self.current_racer else racer.distance_traveled
+                       for racer in self.racers)
+        # Objects are drawn at y + distance, so keep everything still on the trailing racer's screen
+        self.world.cull(SCREEN_HEIGHT + 100 + (self.world.scroll - trailing))
+    
+    def viewports(self):
+        """Screen rect for each racer: side by side for 2 or 3 players, a 2x2 grid for 4."""
+        count = len(self.racers)
+        if count == 4:
+            width, height = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2
+            return [pygame.Rect((i % 2) * width, (i // 2) * height, width, height) for i in range(count)]
+        width = SCREEN_WIDTH // count
+        return [pygame.Rect(i * width, 0, width, SCREEN_HEIGHT) for i in range(count)]
+    
+    @staticmethod
+    def view_crop(viewport, render_scale=1.0):
+        """Largest part of a full-screen view with the viewport's shape, centred on the road and kept to the bottom."""
+        scale = min(SCREEN_WIDTH / viewport.width, SCREEN_HEIGHT / viewport.height) * render_scale
+        view_width, view_height = round(SCREEN_WIDTH * render_scale), round(SCREEN_HEIGHT * render_scale)
+        width, height = min(view_width, round(viewport.width * scale)), min(view_height, round(viewport.height * scale))
+        return pygame.Rect((view_width - width) // 2, view_height - height, width, height)
+    
+    def draw_frame(self):
+        if self.game_state == "start":
+            self.draw_start_screen()
+            return
+        viewports = self.viewports()
+        for i, (racer, viewport) in enumerate(zip(self.racers, viewports)):
+            self.draw_viewport(i, racer, viewport)
+        for viewport in viewports:
+            pygame.draw.rect(self.screen, BLACK, viewport, 2)
+        if self.game_state == "finished":
+            self.draw_finished_screen()
+        elif self.game_state == "game_over":
+            self.draw_game_over_screen()
+    
+    def draw_viewport(self, index, racer, viewport):
+        # Draw the racer's view with the single-player passes, offscreen at the render scale
+        if self.view_surface is None or self.view_surface.get_size() != self.scene_size():
+            self.view_surface = pygame.Surface(self.scene_size()).convert()
+        screen, self.screen = self.screen, self.view_surface
+        try:
+            with self.racing_as(racer):
                 self.draw_road()
                 self.draw_environment()
+                self.draw_rivals(racer)
                 self.draw_car()
-                self.draw_game_over_screen()
-            
-            pygame.display.flip()
-            self.clock.tick(FPS)
+        finally:
+            self.screen = screen
         
-        self.head_tracker.release()
-        pygame.quit()
+        crop = self.view_crop(viewport, self.render_scale)
+        if crop.size == viewport.size:
+            self.screen.blit(self.view_surface, viewport, crop)
+        else:
+            self.screen.blit(pygame.transform.smoothscale(self.view_surface.subsurface(crop), viewport.size), viewport)
+        self.draw_racer_hud(index, racer, viewport)
+    
+    def draw_rivals(self, racer):
+        # Other cars, faded, where they are relative to this racer
+        self.sprites.validate(self.screen)
+        sprite, _ = self.sprites.get("rival_car", (CAR_WIDTH, CAR_HEIGHT),
+                                     lambda surface: self.paint_car(surface, CAR_WIDTH // 2, CAR_HEIGHT // 2),
+                                     opaque=True, alpha=110)
+        scale = self.sprites.scale
+        for rival in self.racers:
+            if rival is racer:
+                continue
+            y = self.car_y - (rival.distance_traveled - racer.distance_traveled)
+            if -CAR_HEIGHT < y < SCREEN_HEIGHT + CAR_HEIGHT:
+                self.screen.blit(sprite, (round((rival.car_x - CAR_WIDTH // 2) * scale),
+                                          round((y - CAR_HEIGHT // 2) * scale)))
+    
+    def draw_racer_hud(self, index, racer, viewport):
+        self.sprites.validate(self.screen)
+        panel, _ = self.sprites.get("racer_hud_panel", (260, 110), lambda surface: surface.fill(BLACK),
+                                    opaque=True, alpha=180)
+        left, top = viewport.left + 5, viewport.top + 5
+        self.screen.blit(panel, (left, top))
+        self.screen.blit(self.hud_text((index, "name"), racer.player_name, "{}", YELLOW), (left + 10, top + 8))
+        self.screen.blit(self.hud_text((index, "speed"), round(racer.car_speed, 1), "Speed: {:.1f}"), (left + 10, top + 42))
+        if self.course_length is None:
+            progress_text = self.hud_text((index, "progress"), round(racer.distance_traveled), "Distance: {:.0f}")
+        else:
+            progress = (racer.distance_traveled / self.course_length) * 100
+            progress_text = self.hud_text((index, "progress"), round(progress, 1), "Progress: {:.1f}%")
+        self.screen.blit(progress_text, (left + 10, top + 76))
+        
+        # Tracking status while it matters, then how this racer's race ended
+        if racer.game_state == "game_over":
+            banner = self.text.render(self.big_font, "CRASHED", RED)
+        elif racer.game_state == "finished":
+            banner = self.text.render(self.big_font, f"{racer.finish_time - self.start_time:.2f}s", YELLOW)
+        else:
+            banner = self.tracking_status_text((index, "tracking"), racer.source)
+            if banner is None:
+                return
+        self.screen.blit(banner, banner.get_rect(center=(viewport.centerx, viewport.top + viewport.height // 3)))
+    
+    def standings(self):
+        """Racers in finishing order: finishers by time, then the rest by how far they got."""
+        return sorted(self.racers, key=lambda racer: (racer.game_state != "finished",
+                                                      racer.finish_time if racer.game_state == "finished"
+                                                      else -racer.distance_traveled))
+    
+    def draw_finished_screen(self):
+        self.draw_end_overlay()
+        self.draw_celebration()
+        
+        title_text = self.text.render(self.big_font, "RESULTS", WHITE)
+        self.screen.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH // 2, 200)))
+        
+        for i, racer in enumerate(self.standings()):
+            if racer.game_state == "finished":
+                race_time = racer.finish_time - self.start_time
+                line = f"{i + 1}. {racer.player_name}  {race_time:.2f}s"
+                # Personal bests are from before this race was written
+                if self.results is not None and (racer.previous_best is None or race_time < racer.previous_best):
+                    line += "  New personal best!"
+                color = YELLOW if i == 0 else WHITE
+            else:
+                line = f"{i + 1}. {racer.player_name}  crashed at {racer.distance_traveled / PIXELS_PER_METER:.0f} m"
+                color = GRAY
+            text = self.text.render(self.font, line, color)
+            self.screen.blit(text, text.get_rect(center=(SCREEN_WIDTH // 2, 280 + i * 40)))
+        
+        restart_text = self.text.render(self.font, "Press SPACE to play again", WHITE)
+        self.screen.blit(restart_text, restart_text.get_rect(center=(SCREEN_WIDTH // 2, 480)))
+        
+        self.draw_leaderboard(540)
+    
+    def draw_game_over_screen(self):
+        # Everyone crashed; the standings still say who got furthest
+        self.draw_finished_screen()
+
+class VectorRaceEnv:
+    """K independent races held in NumPy arrays and stepped together, gym-style.
+    
+    step() applies update_game's rules to every race at once: the car only
+    steers while it stays on the road, speed is clamped to the tuning limits,
+    and hurdles are hit with the same rounding and edge rules as
+    WorldStore.collides. Each race's hurdles come from CourseGenerator, so
+    CarRacingGame(seed=env.seeds[i]) plays the same course.
+    
+    Actions are a (K, 2) array of (horizontal, vertical) movement in [-1, 1].
+    Observations are (K, 6) float32 features: car offset from the road
+    centre, speed and progress, then the clear distance ahead in each lane,
+    all scaled to [-1, 1]. With observation="raster" they are instead
+    (K, rows, cols) uint8 images of the road, hurdles 255 and the car 128.
+    Finished races are reset in place unless auto_reset is False.
+    
+    Only finite courses are supported, since every hurdle is laid out up front.
+    """
+    def __init__(self, num_races, seed=0, course_length=FINISH_LINE_DISTANCE, tuning=None, max_steps=100000,
+                 crash_penalty=100.0, observation="features", raster_size=(24, 32), auto_reset=True):
+        if course_length is None:
+            raise ValueError("VectorRaceEnv needs a finite course_length")
+        if observation not in ("features", "raster"):
+            raise ValueError(f"Unknown observation type: {observation}")
+        tuning = resolve_tuning(tuning)
+        self.num_races = num_races
+        self.course_length = course_length
+        self.max_speed = tuning["max_speed"]
+        self.min_speed = tuning["min_speed"]
+        self.steer_sensitivity = tuning["steer_sensitivity"]
+        self.speed_sensitivity = tuning["speed_sensitivity"]
+        self.hurdle_spacing = tuning["hurdle_spacing"]
+        self.max_steps = max_steps
+        self.crash_penalty = crash_penalty
+        self.observation = observation
+        self.raster_size = raster_size  # (rows, cols)
+        self.auto_reset = auto_reset
+        self.rng = random.Random(seed)
+        
+        self.road_left = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2
+        self.car_top = SCREEN_HEIGHT - 150 - CAR_HEIGHT // 2
+        # Every chunk CourseGenerator.fill would ever stream in for this course
+        limit = course_length + COURSE_LOOKAHEAD
+        self._chunks = -(-limit // COURSE_CHUNK_LENGTH)
+        max_hurdles = -(-self._chunks * COURSE_CHUNK_LENGTH // self.hurdle_spacing)  # One per hurdle grid slot
+        self._scratch = WorldStore()
+        
+        self.seeds = np.zeros(num_races, dtype=np.int64)
+        self.car_x = np.zeros(num_races)
+        self.speed = np.zeros(num_races)
+        self.distance = np.zeros(num_races)
+        self.steps = np.zeros(num_races, dtype=np.int64)
+        # Missing hurdles sit infinitely far up the course, where they never arrive
+        self.hurdle_x = np.zeros((num_races, max_hurdles))
+        self.hurdle_y = np.full((num_races, max_hurdles), -np.inf)
+        self.hurdle_lane = np.full((num_races, max_hurdles), -1, dtype=np.int8)
+    
+    def reset(self):
+        self.reset_races(np.arange(self.num_races))
+        return self.observe()
+    
+    def reset_races(self, races):
+        """Start the given races over on fresh courses, as start_game does."""
+        world = self._scratch
+        for race in races:
+            seed = self.rng.randrange(2 ** 32)
+            world.clear()
+            course = CourseGenerator(seed, self.course_length, hurdle_spacing=self.hurdle_spacing)
+            for index in range(self._chunks):
+                course.generate_chunk(world, index)
+            count = len(world.hurdles)
+            self.seeds[race] = seed
+            self.hurdle_x[race, :count] = world.hurdles.x
+            self.hurdle_y[race, :count] = world.hurdles.y
+            self.hurdle_y[race, count:] = -np.inf
+            self.hurdle_lane[race, :count] = (world.hurdles.x + 20 - self.road_left) // LANE_WIDTH
+            self.hurdle_lane[race, count:] = -1
+        self.car_x[races] = SCREEN_WIDTH // 2
+        self.speed[races] = self.min_speed
+        self.distance[races] = 0
+        self.steps[races] = 0
+    
+    def hurdle_screen_y(self):
+        # The world scrolls exactly as far as the car has travelled; truncate like Rect does
+        return np.trunc(self.hurdle_y + self.distance[:, None])
+    
+    def step(self, actions):
+        """Advance every race one fixed timestep. Returns (observations, rewards, dones, info)."""
+        actions = np.asarray(actions, dtype=float)
+        horizontal, vertical = actions[:, 0], actions[:, 1]
+        
+        # Steering is dropped, not clamped, when it would leave the road
+        new_x = self.car_x + horizontal * self.steer_sensitivity
+        on_road = ((new_x >= self.road_left + CAR_WIDTH // 2) &
+                   (new_x <= self.road_left + ROAD_WIDTH - CAR_WIDTH // 2))
+        self.car_x = np.where(on_road, new_x, self.car_x)
+        self.speed = np.clip(self.speed + vertical * self.speed_sensitivity, self.min_speed, self.max_speed)
+        self.distance += self.speed
+        self.steps += 1
+        
+        car_left = np.trunc(self.car_x - CAR_WIDTH // 2)[:, None]
+        hurdle_y = self.hurdle_screen_y()
+        collided = ((self.hurdle_x < car_left + CAR_WIDTH) & (self.hurdle_x + Hurdle.width > car_left) &
+                    (hurdle_y < self.car_top + CAR_HEIGHT) & (hurdle_y + Hurdle.height > self.car_top)).any(axis=1)
+        finished = ~collided & (self.distance >= self.course_length)
+        truncated = ~collided & ~finished & (self.steps >= self.max_steps)
+        dones = collided | finished | truncated
+        
+        rewards = self.speed / PIXELS_PER_METER  # Metres covered this step
+        rewards[collided] -= self.crash_penalty
+        info = {
+            "collided": collided,
+            "finished": finished,
+            "truncated": truncated,
+            "race_time": self.steps * SIM_DT,
+            "distance": self.distance.copy(),
+            "seed": self.seeds.copy(),
+        }
+        if self.auto_reset and dones.any():
+            self.reset_races(np.flatnonzero(dones))
+        return self.observe(), rewards, dones, info
+    
+    def observe(self):
+        if self.observation == "raster":
+            return self.rasterize()
+        hurdle_y = self.hurdle_screen_y()
+        # Gap between the car's nose and each hurdle that hasn't gone past it yet
+        gap = np.where(hurdle_y < self.car_top + CAR_HEIGHT,
+                       np.maximum(self.car_top - (hurdle_y + Hurdle.height), 0), np.inf)
+        observations = np.empty((self.num_races, 6), dtype=np.float32)
+        observations[:, 0] = (self.car_x - SCREEN_WIDTH // 2) / (ROAD_WIDTH // 2 - CAR_WIDTH // 2)
+        observations[:, 1] = self.speed / self.max_speed
+        observations[:, 2] = np.minimum(self.distance / self.course_length, 1)
+        for lane in range(3):
+            nearest = np.where(self.hurdle_lane == lane, gap, np.inf).min(axis=1)
+            observations[:, 3 + lane] = np.minimum(nearest / SCREEN_HEIGHT, 1)
+        return observations
+    
+    def rasterize(self):
+        """(K, rows, cols) uint8 images of the road from the top of the screen to the bottom."""
+        rows, cols = self.raster_size
+        images = np.zeros((self.num_races, rows, cols), dtype=np.uint8)
+        cell_w = ROAD_WIDTH / cols
+        cell_h = SCREEN_HEIGHT / rows
+        hurdle_y = self.hurdle_screen_y()
+        visible = (hurdle_y + Hurdle.height > 0) & (hurdle_y < SCREEN_HEIGHT)
+        races = np.broadcast_to(np.arange(self.num_races)[:, None], visible.shape)[visible]
+        self._paint(images, races, self.hurdle_x[visible] - self.road_left, hurdle_y[visible],
+                    Hurdle.width, Hurdle.height, cell_w, cell_h, 255)
+        car_left = np.trunc(self.car_x - CAR_WIDTH // 2) - self.road_left
+        self._paint(images, np.arange(self.num_races), car_left, np.full(self.num_races, self.car_top),
+                    CAR_WIDTH, CAR_HEIGHT, cell_w, cell_h, 128)
+        return images
+    
+    @staticmethod
+    def _paint(images, races, left, top, width, height, cell_w, cell_h, value):
+        """Fill every cell touched by a width x height rect at each (left, top), for many rects at once."""
+        _, rows, cols = images.shape
+        c0 = np.clip(np.floor(left / cell_w), 0, cols - 1).astype(int)
+        c1 = np.clip(np.floor((left + width - 1) / cell_w), 0, cols - 1).astype(int)
+        r0 = np.clip(np.floor(top / cell_h), 0, rows - 1).astype(int)
+        r1 = np.clip(np.floor((top + height - 1) / cell_h), 0, rows - 1).astype(int)
+        # A rect covers at most this many cells each way, so paint by offset from its corner
+        for dr in range(int(math.ceil(height / cell_h)) + 1):
+            for dc in range(int(math.ceil(width / cell_w)) + 1):
+                inside = (r0 + dr <= r1) & (c0 + dc <= c1)
+                images[races[inside], r0[inside] + dr, c0[inside] + dc] = value
+
+def benchmark_vector_env(num_races=4096, steps=200, observation="features"):
+    """Race-steps per second of a VectorRaceEnv driven by a vectorized dodge_policy."""
+    env = VectorRaceEnv(num_races, observation=observation)
+    observations = env.reset()
+    races = np.arange(num_races)
+    actions = np.zeros((num_races, 2))
+    start = time.perf_counter()
+    for _ in range(steps):
+        if observation == "features":
+            # Swerve, without accelerating, while the car's own lane is blocked close ahead
+            lane = np.clip((env.car_x - env.road_left) // LANE_WIDTH, 0, 2).astype(int)
+            blocked = observations[races, 3 + lane] < 0.5
+            actions[:, 0] = np.where(blocked, np.where(lane == 2, -1, 1), 0)
+            actions[:, 1] = ~blocked
+        else:
+            actions[:, 1] = 1
+        observations, _, _, _ = env.step(actions)
+    elapsed = time.perf_counter() - start
+    return {
+        "races": num_races,
+        "steps": steps,
+        "observation": observation,
+        "seconds": elapsed,
+        "race_steps_per_second": num_races * steps / elapsed if elapsed > 0 else 0.0,
+    }
+
+def seek_replay(game, source, replay, step):
+    """Move a replaying game to just after step steps, starting from the nearest earlier snapshot."""
+    snapshots = replay.snapshots
+    index = max(0, int(np.searchsorted(snapshots["step"], step, "right")) - 1)
+    game.restore_snapshot(snapshots[index])
+    source.index = int(snapshots[index]["step"])
+    while source.index < min(step, len(replay.steps)) and game.game_state == "playing":
+        game.step()
+
+def play_replay(replay, render=False, speed=1.0, seek=0):
+    """Re-drive update_game from a replay and check that it reproduces the recorded race.
+    
+    Without render the race runs as fast as it can. With render it's shown
+    in a window at speed times real time. Every step's state checksum is
+    compared with the recording; steps skipped by seek aren't checked.
+    Playback always starts from a snapshot, so the clock picks up where the
+    recording's did and race times compare exactly.
+    """
+    if replay.header["sim_dt"] != SIM_DT:
+        raise ValueError(f"Replay was recorded at {1 / replay.header['sim_dt']:.0f} steps per second, not {SIM_HZ}")
+    source = ReplaySource(replay)
+    game = CarRacingGame(source, headless=not render, seed=replay.seed, course_length=replay.header["course_length"],
+                         tuning=replay.header["tuning"], record_results=False)
+    game.player_name = replay.header["player"]
+    game.start_game()
+    # Races recorded after the first start with the clock already running, which snapshot 0 restores
+    seek_replay(game, source, replay, seek)
+    
+    checksums = replay.steps["checksum"]
+    first_mismatch = None
+    def advance():
+        nonlocal first_mismatch
+        game.step()
+        if first_mismatch is None and state_checksum(game) != checksums[source.index - 1]:
+            first_mismatch = source.index - 1
+    
+    start = time.perf_counter()
+    budget = 0.0
+    while game.game_state == "playing" and source.index < len(replay.steps):
+        if not render:
+            advance()
+            continue
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        # Fast-forward runs several steps per rendered frame
+        budget += speed * SIM_HZ / max(1, game.render_fps or FPS)
+        while budget >= 1 and game.game_state == "playing" and source.index < len(replay.steps):
+            advance()
+            budget -= 1
+        game.draw_road()
+        game.draw_environment()
+        game.draw_car()
+        game.draw_ui()
+        game.present()
+        game.clock.tick(game.render_fps)
+    elapsed = time.perf_counter() - start
+    game.head_tracker.release()
+    
+    race_time = (game.finish_time if game.game_state == "finished" else game.now()) - game.start_time
+    return {
+        "seed": replay.seed,
+        "player": replay.header["player"],
+        "steps": source.index,
+        "seconds": elapsed,
+        "state": game.game_state,
+        "race_time": race_time,
+        "recorded_state": replay.state,
+        "recorded_race_time": replay.race_time,
+        "first_mismatch": first_mismatch,
+        "verified": (first_mismatch is None and source.index == len(replay.steps) and game.game_state == replay.state
+                     and race_time == replay.race_time),
+    }
+
+def measure_steering_latency(samples, smoothing):
+    """Head-motion-to-car-motion lag for a smoothing filter, replayed from a raw trace.
+    
+    Drives a headless race on an empty road with the trace passed through the
+    filter (predicted at each step's time, as the async tracker does), then
+    finds the lag that best lines the car's steering up with the raw head
+    movement. Also reports how jittery and how far off the steering was.
+    """
+    movement_filter = FILTERS[smoothing]()
+    index = -1
+    raw = []
+    
+    def policy(game):
+        nonlocal index
+        t = game.now() - game.start_time + samples[0][0]
+        while index + 1 < len(samples) and samples[index + 1][0] <= t:
+            index += 1
+            movement_filter.update(samples[index][0], samples[index][1:])
+        raw.append(samples[index][1])
+        return movement_filter.predict(t)
+    
+    game = CarRacingGame(ScriptedSource(policy), headless=True, seed=0, course_length=None)
+    game.world.clear()
+    game.course.limit = 0  # Empty road, nothing to crash into
+    game.start_game()
+    applied = []
+    for _ in range(int((samples[-1][0] - samples[0][0]) / SIM_DT)):
+        before = game.car_x
+        game.step()
+        applied.append((game.car_x - before) / game.steer_sensitivity)
+        game.car_x = SCREEN_WIDTH // 2  # Re-centre so the road edges never clip the steering
+    
+    raw = np.array(raw)
+    applied = np.array(applied)
+    max_lag = min(len(raw) // 2, int(0.5 / SIM_DT))
+    scores = [float(np.dot(raw[:len(raw) - lag] - raw.mean(), applied[lag:] - applied.mean()))
+              for lag in range(max_lag + 1)]
+    best = int(np.argmax(scores))
+    lag = float(best)
+    if 0 < best < max_lag:
+        # Parabolic fit through the peak for sub-step resolution
+        left, centre, right = scores[best - 1:best + 2]
+        denominator = left - 2 * centre + right
+        if denominator:
+            lag += 0.5 * (left - right) / denominator
+    return {
+        "filter": smoothing,
+        "lag_ms": lag * SIM_DT * 1000,
+        "jitter": float(np.sqrt(np.mean(np.diff(applied, 2) ** 2))) if len(applied) > 2 else 0.0,
+        "rms_error": float(np.sqrt(np.mean((applied - raw) ** 2))),
+    }
+
+def latency_stats(samples):
+    """p50/p95/p99 and mean latency in milliseconds, plus the implied frames per second."""
+    if not samples:
+        return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "fps": 0.0}
+    ordered = sorted(samples)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    mean = sum(ordered) / len(ordered)
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "mean_ms": mean * 1000,
+        "fps": 1.0 / mean if mean > 0 else 0.0,
+    }
+
+def time_calls(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+def populate_world(game, count):
+    """Fill the course with count trees, houses and hurdles spread far ahead of the car.
+    
+    Hurdles only go in the outer lanes so the scripted straight run never hits one.
+    """
+    road_left = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2
+    spread = max(count, 1) * 40
+    world = game.world
+    world.clear()
+    game.course.limit = 0  # Fixed object count, don't stream more course in
+    for _ in range(count):
+        world.trees.add(50 + game.rng.randint(0, 100), -game.rng.randint(0, spread))
+        world.houses.add(SCREEN_WIDTH - 200 + game.rng.randint(0, 50), -game.rng.randint(0, spread))
+        world.hurdles.add(road_left + game.rng.choice([0, 2]) * LANE_WIDTH + LANE_WIDTH // 2 - 20,
+                          -game.rng.randint(0, spread))
+
+def run_benchmarks(video_path=None, object_counts=(50, 500, 5000), iterations=300,
+                   particle_counts=(1000, 2500, PARTICLE_CAPACITY)):
+    """Time the tracker, the simulation step, every draw pass, particles and VectorRaceEnv, returning a JSON-ready dict."""
+    results = {"tracker": None, "update_game": {}, "draw": {}, "particles": {}, "vector_env": {}}
+    
+    if video_path:
+        tracker = HeadTracker(source=video_path)
+        samples = []
+        while True:
+            t0 = time.perf_counter()
+            frame = tracker.read_frame()
+            if frame is None:
+                break
+            tracker.process_frame(frame)
+            samples.append(time.perf_counter() - t0)
+        tracker.release()
+        results["tracker"] = latency_stats(samples)
+    
+    game = CarRacingGame(ScriptedSource(straight_policy), headless=True, seed=0)
+    for count in object_counts:
+        populate_world(game, count)
+        game.player_name = "benchmark"
+        game.start_game()
+        game.car_x = SCREEN_WIDTH // 2
+        game.distance_traveled = 0
+        
+        def step():
+            game.sim_time += SIM_DT
+            game.update_game()
+        results["update_game"][str(count)] = latency_stats(time_calls(step, iterations))
+    
+    # Draw passes render to an offscreen surface so display upload isn't counted
+    game.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    populate_world(game, object_counts[0])
+    game.game_state = "playing"
+    game.distance_traveled = FINISH_LINE_DISTANCE - SCREEN_HEIGHT // 2  # Finish line on screen
+    for name in ("draw_road", "draw_environment", "draw_car", "draw_ui", "draw_game_over_screen"):
+        results["draw"][name] = latency_stats(time_calls(getattr(game, name), iterations))
+    
+    # Keep a full celebration going so every iteration draws one
+    game.game_state = "finished"
+    game.finish_time = game.now()
+    def draw_finished():
+        if game.celebration.count < CELEBRATION_BALLOONS:
+            game.celebrate()
+        game.draw_finished_screen()
+    results["draw"]["draw_finished_screen"] = latency_stats(time_calls(draw_finished, iterations))
+    
+    # One particle update and draw, topped up to each count with confetti
+    for count in particle_counts:
+        game.celebration.clear()
+        def particles():
+            game.burst_confetti(count - game.celebration.count)
+            game.celebration.update(SIM_DT)
+            game.celebration.draw(game.screen, game.sprites)
+        results["particles"][str(count)] = latency_stats(time_calls(particles, iterations))
+    
+    game.head_tracker.release()
+    
+    # Many races per call, for training steering agents
+    for observation in ("features", "raster"):
+        results["vector_env"][observation] = benchmark_vector_env(observation=observation)
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Head-Controlled Car Racing")
+    parser.add_argument("--benchmark-tracking", metavar="VIDEO",
+                        help="compare full-frame and ROI tracking on a recorded video and exit")
+    parser.add_argument("--input", default="camera",
+                        help='input source: "camera", "video:PATH", "trace:PATH" or "scripted:NAME" '
+                             f'({", ".join(POLICIES)})')
+    parser.add_argument("--capture", default="default", choices=CAPTURE_PROFILES,
+                        help="camera capture profile; low captures and detects at 320x240 for slow machines")
+    parser.add_argument("--filter", default=SMOOTHING_FILTER, choices=FILTERS,
+                        help=f"smoothing filter for camera input (default {SMOOTHING_FILTER})")
+    parser.add_argument("--record-trace", metavar="FILE",
+                        help="record the movement the game receives to a trace CSV "
+                             "(use --filter none for raw traces)")
+    parser.add_argument("--measure-latency", metavar="TRACE",
+                        help="replay a raw movement trace through every filter, report steering lag and exit")
+    parser.add_argument("--seed", type=int, help="seed for course generation")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="while racing, only push changed screen regions to the display")
+    parser.add_argument("--render-fps", type=int, default=FPS,
+                        help=f"cap on rendered frames per second, 0 for uncapped (default {FPS}); "
+                             f"the simulation always runs at {SIM_HZ} steps per second")
+    parser.add_argument("--vsync", action="store_true", help="sync rendering to the display instead of capping it")
+    parser.add_argument("--fixed-quality", action="store_true",
+                        help="always render at full quality instead of lowering it when frames run over budget")
+    parser.add_argument("--quality-log", metavar="FILE",
+                        help="append every quality level change to FILE as JSON lines")
+    parser.add_argument("--endless", action="store_true", help="race on an endless course with no finish line")
+    parser.add_argument("--headless", type=int, metavar="RACES",
+                        help="run RACES races on a fixed timestep with no window and print the results")
+    parser.add_argument("--render", action="store_true",
+                        help="also run the draw passes in headless mode, or show --play-replay in a window")
+    parser.add_argument("--record-replay", metavar="DIR",
+                        help="save a replay of every race to DIR")
+    parser.add_argument("--play-replay", metavar="FILE",
+                        help="re-run a saved replay, check it reproduces the recorded race and exit")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="playback speed for --play-replay --render (default 1.0)")
+    parser.add_argument("--replay-seek", type=int, default=0, metavar="STEP",
+                        help="start --play-replay at simulation step STEP")
+    parser.add_argument("--batch", type=int, metavar="RACES",
+                        help="race each --policy on RACES seeds across a process pool and print aggregate stats")
+    parser.add_argument("--policy", action="append", metavar="SPEC",
+                        help="input source spec to batch-race, repeatable (default: --input)")
+    parser.add_argument("--processes", type=int, help="worker processes for --batch (default: all cores)")
+    parser.add_argument("--tune", action="append", metavar="KEY=VALUE",
+                        help=f"override a gameplay constant ({', '.join(DEFAULT_TUNING)}), repeatable")
+    parser.add_argument("--players", type=int, default=1,
+                        help="2-4 players in split screen; camera input tracks every face in one detection pass")
+    parser.add_argument("--history", nargs="?", const="", metavar="PLAYER",
+                        help="print the most recent races, or only PLAYER's, from the local results and exit")
+    parser.add_argument("--leaderboard-url", metavar="URL",
+                        help="share race results with a leaderboard service (see leaderboard_service.py)")
+    parser.add_argument("--profile-trace", metavar="FILE",
+                        help="record per-phase frame timings and write them to FILE on exit "
+                             "(.json for Chrome trace format, otherwise CSV)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time the tracker, simulation step, draw passes, particles and vector environment, then exit")
+    parser.add_argument("--benchmark-video", metavar="VIDEO",
+                        help="recorded video to time the head tracker on")
+    parser.add_argument("--benchmark-output", metavar="FILE",
+                        help="write benchmark results as JSON to FILE instead of stdout")
+    args = parser.parse_args()
+    if not 1 <= args.players <= 4:
+        parser.error("--players must be between 1 and 4")
+    if args.players > 1 and (args.record_trace or args.record_replay):
+        parser.error("--record-trace and --record-replay only record single-player races")
+    return args
+
+def run_headless_races(args):
+    seed = args.seed if args.seed is not None else 0
+    start = time.perf_counter()
+    total_steps = 0
+    # One recorder for every race, so its race counter numbers the replay files
+    recorder = ReplayRecorder(args.record_replay) if args.record_replay else None
+    for race in range(args.headless):
+        game = CarRacingGame(open_input_source(args.input, profile=CAPTURE_PROFILES[args.capture]), headless=True,
+                             seed=seed + race, course_length=None if args.endless else FINISH_LINE_DISTANCE)
+        game.replay_recorder = recorder
+        result = game.run_headless(render=args.render)
+        game.head_tracker.release()
+        total_steps += result["steps"]
+        print(json.dumps(result))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"races": args.headless, "steps": total_steps, "seconds": elapsed,
+                      "steps_per_second": total_steps / elapsed if elapsed > 0 else 0.0}))
+
+def simulate_race(task):
+    """Run one headless race for the batch simulator. Module-level so a process pool can pickle it."""
+    seed, policy, tuning, course_length, max_steps = task
+    game = CarRacingGame(open_input_source(policy), headless=True, seed=seed, course_length=course_length,
+                         tuning=tuning)
+    try:
+        result = game.run_headless(max_steps=max_steps)
+    finally:
+        game.head_tracker.release()
+    result["policy"] = policy
+    return result
+
+def summarize_races(results):
+    """Finish rate, race-time distribution and collision rate for a list of race results."""
+    finished = sorted(r["race_time"] for r in results if r["state"] == "finished")
+    distance_km = sum(r["distance"] for r in results) / PIXELS_PER_METER / 1000
+    collisions = sum(r["collisions"] for r in results)
+    def pick(q):
+        return finished[min(len(finished) - 1, int(len(finished) * q))] if finished else None
+    return {
+        "races": len(results),
+        "finish_rate": len(finished) / len(results) if results else 0.0,
+        "time_mean": sum(finished) / len(finished) if finished else None,
+        "time_min": finished[0] if finished else None,
+        "time_p50": pick(0.50),
+        "time_p90": pick(0.90),
+        "time_max": finished[-1] if finished else None,
+        "collisions": collisions,
+        "collisions_per_km": collisions / distance_km if distance_km else 0.0,
+        "steps": sum(r["steps"] for r in results),
+    }
+
+def run_batch(seeds, policies, tuning=None, course_length=FINISH_LINE_DISTANCE, max_steps=100000, processes=None):
+    """Race every policy on every seed across a process pool and aggregate the results per policy.
+    
+    policies are input source specs, e.g. "scripted:dodge" or "trace:PATH".
+    """
+    resolved = resolve_tuning(tuning)  # Checked here, not once per worker
+    tasks = [(seed, policy, resolved, course_length, max_steps) for policy in policies for seed in seeds]
+    processes = processes or multiprocessing.cpu_count()
+    start = time.perf_counter()
+    # Pygame and the tracker may already have threads running in this process, so don't fork it
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        # A few races per message keeps IPC overhead small next to the races themselves
+        chunksize = max(1, len(tasks) // (processes * 8))
+        results = list(pool.imap_unordered(simulate_race, tasks, chunksize))
+        # SDL catches SIGTERM in workers that opened a display, so let them exit rather than terminating them
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+    
+    summary = {policy: summarize_races([r for r in results if r["policy"] == policy]) for policy in policies}
+    steps = sum(r["steps"] for r in results)
+    return {
+        "tuning": resolved,
+        "processes": processes,
+        "seconds": elapsed,
+        "steps_per_second": steps / elapsed if elapsed > 0 else 0.0,
+        "policies": summary,
+    }
+
+def resolve_tuning(tuning=None):
+    """DEFAULT_TUNING with the given overrides, each checked and converted to its default's type.
+    
+    Every entry point that takes tuning goes through this, so a bad value is
+    a ValueError up front rather than a crash deep in course generation.
+    """
+    resolved = dict(DEFAULT_TUNING)
+    for key, value in (tuning or {}).items():
+        if key not in DEFAULT_TUNING:
+            raise ValueError(f"Unknown tuning key {key!r}, expected one of {', '.join(DEFAULT_TUNING)}")
+        if isinstance(value, bool) or not isinstance(value, (int, float, np.integer, np.floating)):
+            raise ValueError(f"Tuning key {key!r} takes a number, got {value!r}")
+        if isinstance(DEFAULT_TUNING[key], int):
+            # Pixel spacings must stay whole numbers rather than be silently truncated
+            if not float(value).is_integer():
+                raise ValueError(f"Tuning key {key!r} takes a whole number, got {value!r}")
+            value = int(value)
+        else:
+            value = float(value)
+        resolved[key] = value
+    if resolved["hurdle_spacing"] <= 0:
+        raise ValueError(f"hurdle_spacing must be positive, got {resolved['hurdle_spacing']}")
+    if not 0 <= resolved["min_speed"] <= resolved["max_speed"]:
+        raise ValueError(f"Speeds must satisfy 0 <= min_speed <= max_speed, got "
+                         f"{resolved['min_speed']} and {resolved['max_speed']}")
+    return resolved
+
+def parse_tuning(pairs):
+    tuning = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        try:
+            tuning[key] = float(value)
+        except ValueError:
+            raise SystemExit(f"Tuning key {key!r} takes a number, got {value!r}")
+    try:
+        resolved = resolve_tuning(tuning)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return {key: resolved[key] for key in tuning}
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.benchmark_tracking:
+        for mode, stats in benchmark_tracking_modes(args.benchmark_tracking).items():
+            print(f"{mode:>5}: {stats['fps']:.1f} FPS, "
+                  f"{stats['latency_mean_ms']:.2f} ms mean / {stats['latency_p95_ms']:.2f} ms p95 "
+                  f"detection-to-control over {stats['frames']} frames "
+                  f"({stats['full_scans']} full, {stats['roi_scans']} ROI, "
+                  f"{stats['template_hits']} template)")
+        raise SystemExit(0)
+    
+    if args.history is not None:
+        results = ResultsStore()
+        for race in results.history(args.history.strip() or None):
+            print(json.dumps(race))
+        results.close()
+        raise SystemExit(0)
+    
+    if args.headless:
+        run_headless_races(args)
+        raise SystemExit(0)
+    
+    if args.play_replay:
+        result = play_replay(Replay.load(args.play_replay), render=args.render, speed=args.replay_speed,
+                             seek=args.replay_seek)
+        print(json.dumps(result))
+        raise SystemExit(0 if result["verified"] else 1)
+    
+    if args.batch:
+        first_seed = args.seed if args.seed is not None else 0
+        report = run_batch(range(first_seed, first_seed + args.batch), args.policy or [args.input],
+                           tuning=parse_tuning(args.tune),
+                           course_length=None if args.endless else FINISH_LINE_DISTANCE,
+                           processes=args.processes)
+        print(json.dumps(report, indent=2))
+        raise SystemExit(0)
+    
+    if args.measure_latency:
+        trace = load_trace(args.measure_latency)
+        for name in FILTERS:
+            result = measure_steering_latency(trace, name)
+            print(f"{name:>15}: {result['lag_ms']:6.1f} ms lag, jitter {result['jitter']:.4f}, "
+                  f"RMS error {result['rms_error']:.4f}")
+        raise SystemExit(0)
+    
+    if args.benchmark:
+        report = json.dumps(run_benchmarks(args.benchmark_video), indent=2)
+        if args.benchmark_output:
+            with open(args.benchmark_output, "w") as f:
+                f.write(report + "\n")
+        else:
+            print(report)
+        raise SystemExit(0)
+    
     try:
-        game = CarRacingGame()
+        profile = CAPTURE_PROFILES[args.capture]
+        if args.players > 1:
+            # Players share one camera and one detection pass; other inputs get a source each
+            if args.input == "camera":
+                sources = MultiFaceTracker(args.players, profile=profile, smoothing=args.filter).sources()
+            else:
+                sources = [open_input_source(args.input, args.filter, profile) for _ in range(args.players)]
+            game = SplitScreenGame(sources, seed=args.seed, trace_path=args.profile_trace,
+                                   course_length=None if args.endless else FINISH_LINE_DISTANCE,
+                                   render_fps=args.render_fps, vsync=args.vsync, leaderboard_url=args.leaderboard_url,
+                                   adaptive_quality=not args.fixed_quality, quality_log=args.quality_log)
+        else:
+            source = open_input_source(args.input, args.filter, profile)
+            if args.record_trace:
+                source = TraceRecorder(source)
+            game = CarRacingGame(source, seed=args.seed, trace_path=args.profile_trace,
+                                 course_length=None if args.endless else FINISH_LINE_DISTANCE,
+                                 dirty_rects=args.dirty_rects, render_fps=args.render_fps, vsync=args.vsync,
+                                 leaderboard_url=args.leaderboard_url, adaptive_quality=not args.fixed_quality,
+                                 quality_log=args.quality_log)
+        if args.record_replay:
+            game.replay_recorder = ReplayRecorder(args.record_replay)
         game.run()
+        if args.record_trace:
+            save_trace(args.record_trace, source.samples)
     except Exception as e:
         print(f"Error: {e}")
         print("Make sure you have a webcam connected and the required libraries installed:")
@@ -0,0 +1,185 @@
+import os
+import json
+import argparse
+import threading
+from flask import Flask, jsonify, request
+
+# Optional leaderboard service shared by several game machines.
+# Run with: python leaderboard_service.py --store file:leaderboard.jsonl
+
+RACE_FIELDS = ("id", "player", "seed", "race_time", "distance", "collisions", "finished", "avg_fps", "recorded_at")
+MAX_BATCH = 500  # Races accepted in one submit request
+DEFAULT_LIMIT = 10
+
+class LeaderboardStore:
+    """Where submitted races go. Races carry a client-made id, so resubmitting one is a no-op."""
+    def add_races(self, races):
+        """Store races, returning how many were new."""
+        raise NotImplementedError
+    
+    def leaderboard(self, limit=DEFAULT_LIMIT):
+        """[(player, best time)] for the fastest players, fastest first."""
+        raise NotImplementedError
+    
+    def best(self, player):
+        raise NotImplementedError
+
+class MemoryStore(LeaderboardStore):
+    """Keeps everything in memory, for tests and one-off events."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = set()
+        self._bests = {}
+    
+    def add_races(self, races):
+        added = 0
+        with self._lock:
+            for race in races:
+                if race["id"] in self._ids:
+                    continue
+                self._ids.add(race["id"])
+                added += 1
+                self._remember(race)
+        return added
+    
+    def _remember(self, race):
+        if race["finished"]:
+            best = self._bests.get(race["player"])
+            if best is None or race["race_time"] < best:
+                self._bests[race["player"]] = race["race_time"]
+    
+    def leaderboard(self, limit=DEFAULT_LIMIT):
+        with self._lock:
+            return sorted(self._bests.items(), key=lambda entry: entry[1])[:limit]
+    
+    def best(self, player):
+        with self._lock:
+            return self._bests.get(player)
+
+class FileStore(MemoryStore):
+    """Appends races to a JSON-lines file and indexes it in memory on start."""
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        race = json.loads(line)
+                        self._ids.add(race["id"])
+                        self._remember(race)
+        except FileNotFoundError:
+            pass
+    
+    def add_races(self, races):
+        added = []
+        with self._lock:
+            for race in races:
+                if race["id"] not in self._ids:
+                    self._ids.add(race["id"])
+                    self._remember(race)
+                    added.append(race)
+            if added:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.writelines(json.dumps(race) + "\n" for race in added)
+        return len(added)
+
+class MongoStore(LeaderboardStore):
+    """Races in a MongoDB collection, for leaderboards shared across machines."""
+    def __init__(self, uri, database="head_racing", collection="races"):
+        import pymongo  # Only needed for this store
+        self._pymongo = pymongo
+        self.races = pymongo.MongoClient(uri)[database][collection]
+        self.races.create_index("id", unique=True)
+        self.races.create_index([("finished", 1), ("player", 1), ("race_time", 1)])
+    
+    def add_races(self, races):
+        if not races:
+            return 0
+        try:
+            result = self.races.insert_many([dict(race) for race in races], ordered=False)
+            return len(result.inserted_ids)
+        except self._pymongo.errors.BulkWriteError as e:
+            # Duplicate ids are races we already have; anything else is a real failure
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            return e.details["nInserted"]
+    
+    def leaderboard(self, limit=DEFAULT_LIMIT):
+        pipeline = [
+            {"$match": {"finished": 1}},
+            {"$group": {"_id": "$player", "best": {"$min": "$race_time"}}},
+            {"$sort": {"best": 1}},
+            {"$limit": limit},
+        ]
+        return [(entry["_id"], entry["best"]) for entry in self.races.aggregate(pipeline)]
+    
+    def best(self, player):
+        race = self.races.find_one({"finished": 1, "player": player}, sort=[("race_time", 1)])
+        return race["race_time"] if race else None
+
+def open_store(spec):
+    """Build a store from "memory", "file:PATH" or a mongodb:// URI."""
+    if spec == "memory":
+        return MemoryStore()
+    if spec.startswith("file:"):
+        return FileStore(spec[len("file:"):])
+    if spec.startswith(("mongodb://", "mongodb+srv://")):
+        return MongoStore(spec)
+    raise ValueError(f"Unknown leaderboard store: {spec}")
+
+NUMERIC_FIELDS = ("seed", "race_time", "distance", "collisions", "avg_fps", "recorded_at")
+
+def validate_race(race):
+    if not isinstance(race, dict):
+        raise ValueError("race must be an object")
+    missing = [field for field in RACE_FIELDS if field not in race]
+    if missing:
+        raise ValueError(f"race is missing {', '.join(missing)}")
+    for field in ("id", "player"):
+        if not isinstance(race[field], str) or not race[field].strip():
+            raise ValueError(f"{field} must be a non-empty string")
+    for field in NUMERIC_FIELDS:
+        # bool is an int subclass, but true/false in a number field is a client bug
+        if isinstance(race[field], bool) or not isinstance(race[field], (int, float)):
+            raise ValueError(f"{field} must be a number")
+    # MongoStore matches finished == 1 while MemoryStore tests truthiness, so only 0 and 1 mean the same to both
+    if isinstance(race["finished"], bool) or race["finished"] not in (0, 1):
+        raise ValueError("finished must be 0 or 1")
+    return {field: race[field] for field in RACE_FIELDS}
+
+def create_app(store):
+    app = Flask(__name__)
+    
+    @app.post("/races")
+    def submit_races():
+        races = request.get_json(silent=True)
+        if not isinstance(races, list) or len(races) > MAX_BATCH:
+            return jsonify(error=f"expected a JSON list of at most {MAX_BATCH} races"), 400
+        try:
+            races = [validate_race(race) for race in races]
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        return jsonify(accepted=len(races), added=store.add_races(races))
+    
+    @app.get("/leaderboard")
+    def leaderboard():
+        limit = min(max(request.args.get("limit", DEFAULT_LIMIT, type=int), 1), 100)
+        return jsonify(leaderboard=[{"player": player, "race_time": race_time}
+                                    for player, race_time in store.leaderboard(limit)])
+    
+    @app.get("/players/<player>/best")
+    def player_best(player):
+        return jsonify(player=player, race_time=store.best(player))
+    
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Head-Controlled Car Racing leaderboard service")
+    parser.add_argument("--store", default="file:leaderboard.jsonl",
+                        help='"memory", "file:PATH" or a mongodb:// URI (default file:leaderboard.jsonl)')
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    create_app(open_store(args.store)).run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,36 @@
+from car_racing_game import FaceController
+
+CENTRED = (290, 210, 60, 60)  # Face box centred in a 640x480 frame
+
+
+def calibrated_at(frame_size):
+    controller = FaceController()
+    for _ in range(controller.calibration_frames):
+        controller.track_face(CENTRED, frame_size)
+    return controller.calibration()
+
+
+def test_profile_is_applied_on_the_first_frame_at_its_resolution():
+    controller = FaceController()
+    controller.apply_calibration(calibrated_at((640, 480)))
+    assert controller.frame_count == 0  # Nothing to check the resolution against yet
+    assert controller.track_face(CENTRED, (640, 480)) == (0, 0)
+    assert controller.frame_count == controller.calibration_frames
+    assert controller.filtered
+
+
+def test_profile_from_another_resolution_is_ignored_on_the_first_frame():
+    controller = FaceController()
+    controller.apply_calibration(calibrated_at((640, 480)))
+    # The same face seen by a 320x240 capture must not read as a hard turn
+    assert controller.track_face((145, 105, 30, 30), (320, 240)) == (0, 0)
+    assert controller.frame_count == 1  # Calibrating from scratch
+    assert controller.pending_calibration is None
+
+
+def test_recalibrating_drops_a_pending_profile():
+    controller = FaceController()
+    controller.apply_calibration(calibrated_at((640, 480)))
+    controller.recalibrate()
+    controller.track_face(CENTRED, (640, 480))
+    assert controller.frame_count == 1
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import numpy as np
+
+from car_racing_game import (AsyncHeadTracker, FaceController, InputGroup, MAX_SAMPLE_AGE, MultiFaceTracker,
+                             TraceRecorder)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+class FakeCamera:
+    """Stands in for a HeadTracker: blank frames with a fixed set of detected faces."""
+    def __init__(self, faces=(), movement=(0, 0)):
+        self.faces = list(faces)
+        self.movement = movement
+        self.capture_time = 0.0
+        self.released = False
+        self.filtered = False
+        self.calibrated_on = None
+    
+    def read_frame(self):
+        time.sleep(0.001)
+        self.capture_time = time.time()
+        return np.zeros((480, 640, 3), np.uint8)
+    
+    def process_frame(self, frame):
+        return self.movement
+    
+    def detection_image(self, frame):
+        return frame
+    
+    def detect_all_faces(self, gray):
+        return list(self.faces)
+    
+    def capture_box(self, face, frame_width):
+        return face
+    
+    def recalibrate(self):
+        self.calibrated_on = threading.current_thread().name
+    
+    def status(self):
+        return "ready"
+    
+    def release(self):
+        self.released = True
+
+
+def test_async_tracker_publishes_the_latest_sample():
+    camera = FakeCamera(movement=(0.5, -0.25))
+    tracker = AsyncHeadTracker(camera)
+    try:
+        wait_for(lambda: tracker.get_sample()[2] > 0)
+        assert tracker.get_head_movement() == (0.5, -0.25)
+        tracker.recalibrate()
+        wait_for(lambda: camera.calibrated_on is not None)
+        assert camera.calibrated_on == "HeadTracker"  # Applied on the worker, not the caller's thread
+        assert tracker.latency_report()["capture"]["count"] > 0
+    finally:
+        tracker.release()
+    assert camera.released
+    
+    # A stalled tracker stops steering instead of repeating its last sample
+    tracker._samples = [(0.5, -0.25, time.time() - 2 * MAX_SAMPLE_AGE)]
+    assert tracker.get_head_movement() == (0, 0)
+
+
+def test_async_tracker_reports_a_camera_that_fails_to_open():
+    def broken_camera():
+        raise OSError("no camera")
+    tracker = AsyncHeadTracker(make_tracker=broken_camera)
+    wait_for(lambda: tracker.status() == "unavailable")
+    tracker.release()
+
+
+class FakeMultiFaceTracker(MultiFaceTracker):
+    faces = [(400, 100, 80, 80), (100, 100, 80, 80)]
+    
+    def open_camera(self):
+        return FakeCamera(self.faces)
+
+
+def test_multi_face_tracker_gives_each_player_a_face_and_one_latency_report():
+    tracker = FakeMultiFaceTracker(2)
+    group = TraceRecorder(InputGroup(tracker.sources()))
+    try:
+        wait_for(lambda: all(c.frame_count >= FaceController.calibration_frames for c in tracker.controllers))
+        assert group.status() == "ready"
+        assert [track[0] for track in tracker.tracks] == [100, 400]  # Free slots fill from the left
+        report = group.latency_report()
+        assert set(report) == {"capture", "detect", "publish"}
+        assert report["detect"]["count"] > 0
+    finally:
+        group.release()
+    assert tracker.camera.released
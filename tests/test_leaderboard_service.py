@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("flask")
+
+from leaderboard_service import MAX_BATCH, FileStore, MemoryStore, create_app
+
+
+def race(race_id, player="Ana", race_time=12.5, finished=1):
+    return {"id": race_id, "player": player, "seed": 1, "race_time": race_time, "distance": 5000.0,
+            "collisions": 1 - finished, "finished": finished, "avg_fps": 60.0, "recorded_at": 0.0}
+
+
+@pytest.fixture
+def client():
+    return create_app(MemoryStore()).test_client()
+
+
+def test_resubmitted_races_are_only_added_once(client):
+    response = client.post("/races", json=[race("a"), race("b", "Ben", 11.0)])
+    assert response.get_json() == {"accepted": 2, "added": 2}
+    # A client retrying after a lost response sends the same ids again
+    response = client.post("/races", json=[race("a"), race("b", "Ben", 11.0), race("c", race_time=10.0)])
+    assert response.get_json() == {"accepted": 3, "added": 1}
+    assert client.get("/leaderboard").get_json() == {"leaderboard": [
+        {"player": "Ana", "race_time": 10.0}, {"player": "Ben", "race_time": 11.0}]}
+
+
+def test_only_finished_races_set_a_best(client):
+    client.post("/races", json=[race("a", race_time=9.0, finished=0), race("b", race_time=12.0)])
+    assert client.get("/players/Ana/best").get_json() == {"player": "Ana", "race_time": 12.0}
+    assert client.get("/players/Nobody/best").get_json() == {"player": "Nobody", "race_time": None}
+
+
+@pytest.mark.parametrize("body", [
+    {"races": []},
+    [race(str(i)) for i in range(MAX_BATCH + 1)],
+    [race("a"), {key: value for key, value in race("b").items() if key != "race_time"}],
+    [race("a", player="  ")],
+    [race("a", race_time="fast")],
+    [race(["a"])],
+    [race("")],
+    [race(7)],
+    [dict(race("a"), finished=True)],
+    [dict(race("a"), finished="1")],
+    [dict(race("a"), finished=2)],
+    [dict(race("a"), distance=True)],
+    [dict(race("a"), seed=None)],
+    ["not a race"],
+])
+def test_bad_batches_are_rejected_whole(client, body):
+    response = client.post("/races", json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    assert client.get("/leaderboard").get_json() == {"leaderboard": []}
+
+
+def test_non_json_body_is_rejected(client):
+    response = client.post("/races", data="nope", content_type="text/plain")
+    assert response.status_code == 400
+
+
+def test_leaderboard_limit_is_clamped(client):
+    client.post("/races", json=[race(str(i), f"P{i}", 10.0 + i) for i in range(12)])
+    assert len(client.get("/leaderboard?limit=3").get_json()["leaderboard"]) == 3
+    assert len(client.get("/leaderboard?limit=0").get_json()["leaderboard"]) == 1
+    assert len(client.get("/leaderboard").get_json()["leaderboard"]) == 10
+
+
+def test_file_store_remembers_ids_across_restarts(tmp_path):
+    path = str(tmp_path / "leaderboard.jsonl")
+    assert FileStore(path).add_races([race("a"), race("b", "Ben", 11.0)]) == 2
+    store = FileStore(path)
+    assert store.add_races([race("a"), race("c", race_time=10.0)]) == 1
+    assert store.leaderboard() == [("Ana", 10.0), ("Ben", 11.0)]
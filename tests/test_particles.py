@@ -0,0 +1,32 @@
+import numpy as np
+
+from car_racing_game import QUALITY_LEVELS, CarRacingGame, ParticleSystem, ScriptedSource, straight_policy
+
+
+def test_emission_stops_at_the_limit():
+    system = ParticleSystem(capacity=100)
+    system.set_limit(40)
+    assert system.emit(30, 0, x=0.0, y=0.0) == 30
+    assert system.emit(30, 0, x=0.0, y=0.0) == 10
+    assert system.count == 40
+
+
+def test_lowering_the_limit_drops_the_oldest_particles():
+    system = ParticleSystem(capacity=100)
+    system.emit(50, 0, x=np.arange(50, dtype=float), y=0.0)
+    system.set_limit(20)
+    assert system.count == 20
+    assert list(system.particles["x"][:20]) == list(range(30, 50))
+    system.set_limit(1000)
+    assert system.limit == 100  # Never above capacity
+
+
+def test_lowest_quality_caps_a_running_celebration():
+    game = CarRacingGame(ScriptedSource(straight_policy), headless=True, seed=1, record_results=False)
+    game.celebrate()
+    before = game.celebration.count
+    game.apply_quality(QUALITY_LEVELS[-1])
+    capacity = len(game.celebration.particles)
+    assert game.celebration.count == min(before, round(capacity * QUALITY_LEVELS[-1]["particles"]))
+    game.apply_quality(QUALITY_LEVELS[0])
+    assert game.celebration.limit == capacity
@@ -0,0 +1,58 @@
+import csv
+import json
+
+from car_racing_game import FrameProfiler
+
+
+def profile_frames(path, frames):
+    profiler = FrameProfiler(trace_path=str(path))
+    profiler.TRACE_BATCH = 5  # Force several batches
+    for _ in range(frames):
+        profiler.begin_frame()
+        with profiler.phase("input"):
+            pass
+        with profiler.phase("simulation"):
+            with profiler.phase("tracking"):
+                pass
+        profiler.end_frame()
+    profiler.close()
+
+
+def test_chrome_trace_is_streamed_as_valid_json(tmp_path):
+    path = tmp_path / "trace.json"
+    profile_frames(path, 7)
+    events = json.loads(path.read_text())["traceEvents"]
+    assert len(events) == 7 * 3
+    assert [event["name"] for event in events[:3]] == ["input", "tracking", "simulation"]
+
+
+def test_csv_has_one_row_per_frame(tmp_path):
+    path = tmp_path / "trace.csv"
+    profile_frames(path, 7)
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row["frame"]) for row in rows] == list(range(7))
+    assert all(float(row["simulation_ms"]) >= 0 for row in rows)
+
+
+def test_empty_trace_is_still_valid_json(tmp_path):
+    path = tmp_path / "trace.json"
+    FrameProfiler(trace_path=str(path)).close()
+    assert json.loads(path.read_text())["traceEvents"] == []
+
+
+def test_overlay_reuses_cached_surfaces():
+    from car_racing_game import CarRacingGame, ScriptedSource, straight_policy
+    game = CarRacingGame(ScriptedSource(straight_policy), headless=True, seed=1, record_results=False)
+    profiler = game.profiler
+    for _ in range(3):
+        profiler.begin_frame()
+        with profiler.phase("draw"):
+            pass
+        profiler.end_frame()
+    profiler.draw_overlay(game.screen, game.font, game.sprites, game.text)
+    panel = game.sprites.get("profiler_panel", None, None)
+    rendered = dict(game.text._surfaces)
+    profiler.draw_overlay(game.screen, game.font, game.sprites, game.text)
+    assert game.sprites.get("profiler_panel", None, None) is panel
+    assert all(game.text._surfaces[key] is surface for key, surface in rendered.items())
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from car_racing_game import (FINISH_LINE_DISTANCE, CarRacingGame, Replay, ReplayRecorder, ScriptedSource,
+                             dodge_policy, play_replay, straight_policy)
+
+
+def record_races(policy, races, seed=7, course_length=3000):
+    """Race a scripted policy several times in one game, returning the replay of each race."""
+    game = CarRacingGame(ScriptedSource(policy), headless=True, seed=seed, course_length=course_length,
+                         record_results=False)
+    game.replay_recorder = ReplayRecorder()
+    replays = []
+    for _ in range(races):
+        game.run_headless()
+        replays.append(game.replay_recorder.last_replay)
+        game.restart_game()
+    return replays
+
+
+@pytest.mark.parametrize("policy", [straight_policy, dodge_policy])
+def test_replay_reproduces_recorded_race(policy):
+    replay, = record_races(policy, 1)
+    result = play_replay(replay)
+    assert result["verified"]
+    assert result["steps"] == len(replay.steps)
+
+
+def test_later_race_in_a_session_replays_with_its_own_clock():
+    first, second = record_races(dodge_policy, 2)
+    assert second.snapshots[0]["start_time"] > 0
+    result = play_replay(second)
+    assert result["verified"]
+    assert result["race_time"] == second.race_time
+
+
+def test_replay_survives_save_and_load(tmp_path):
+    replay, = record_races(dodge_policy, 1)
+    path = tmp_path / "race.hrr"
+    replay.save(str(path))
+    loaded = Replay.load(str(path))
+    assert loaded.header == dict(replay.header, steps=len(replay.steps), snapshots=len(replay.snapshots))
+    assert (loaded.steps == replay.steps).all()
+    assert play_replay(loaded)["verified"]
+
+
+def test_seek_skips_to_step_and_checks_the_rest():
+    replay, = record_races(dodge_policy, 1, course_length=FINISH_LINE_DISTANCE)
+    seek = len(replay.steps) // 2
+    result = play_replay(replay, seek=seek)
+    assert result["first_mismatch"] is None
+    assert result["verified"]
+
+
+def test_races_ending_together_get_separate_files(tmp_path):
+    recorder = ReplayRecorder(str(tmp_path))
+    for seed in range(3):
+        game = CarRacingGame(ScriptedSource(straight_policy), headless=True, seed=seed, record_results=False)
+        game.replay_recorder = recorder
+        game.run_headless()
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join()
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert len(names) == 3
+    assert sorted(Replay.load(str(tmp_path / name)).seed for name in names) == [0, 1, 2]
@@ -0,0 +1,44 @@
+from car_racing_game import CarRacingGame, ResultsStore, ScriptedSource, dodge_policy
+
+
+def test_races_are_stored_under_the_trimmed_name(tmp_path):
+    path = str(tmp_path / "results.db")
+    game = CarRacingGame(ScriptedSource(dodge_policy), headless=True, seed=7, record_results=False)
+    game.results = ResultsStore(path)
+    game.player_name = "  Ana "
+    result = game.run_headless()
+    game.results.close()
+    assert result["state"] == "finished"
+    
+    results = ResultsStore(path)
+    try:
+        history = results.history("Ana")
+        assert [race["player"] for race in history] == ["Ana"]
+        assert history[0]["race_time"] == result["race_time"]
+        assert results.history() == history
+    finally:
+        results.close()
+
+
+def test_history_is_newest_first_and_limited(tmp_path):
+    results = ResultsStore(str(tmp_path / "results.db"))
+    for i in range(5):
+        results.record({"player": "Ana" if i % 2 else "Ben", "seed": i, "race_time": 10.0 + i, "distance": 5000.0,
+                        "collisions": 0, "finished": 1, "avg_fps": 60.0, "recorded_at": float(i)})
+    results.close()
+    assert [race["seed"] for race in results.history(limit=3)] == [4, 3, 2]
+    assert [race["seed"] for race in results.history("Ana")] == [3, 1]
+
+
+def test_history_before_anything_was_written(tmp_path):
+    path = tmp_path / "fresh" / "results.db"
+    results = ResultsStore(str(path))
+    try:
+        assert results.history() == []
+    finally:
+        results.close()
+    # The file can also exist before the writer has created the table
+    results = ResultsStore.__new__(ResultsStore)
+    results.path = str(tmp_path / "empty.db")
+    open(results.path, "wb").close()
+    assert results.history() == []
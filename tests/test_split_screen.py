@@ -0,0 +1,50 @@
+from car_racing_game import (Hurdle, LANE_WIDTH, ROAD_WIDTH, SCREEN_WIDTH, ScriptedSource,
+                             SplitScreenGame, straight_policy)
+
+
+def test_trailing_racer_still_hits_hurdles_behind_the_leader():
+    game = SplitScreenGame([ScriptedSource(straight_policy), ScriptedSource(straight_policy)],
+                           headless=True, seed=1, course_length=None, record_results=False)
+    game.player_name = "Leader, Trailer"
+    game.start_game()
+    leader, trailer = game.racers
+    
+    # One hurdle in the middle lane, far enough ahead that the leader is long past it when the trailer arrives
+    game.world.hurdles.clear()
+    game.course.limit = 0
+    middle_lane = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2 + LANE_WIDTH + LANE_WIDTH // 2
+    game.world.hurdles.add(middle_lane - Hurdle.width // 2, game.car_y - 1500)
+    
+    for _ in range(5000):
+        # The leader moves out of the middle lane and floors it, the trailer holds the lane at minimum speed
+        steer = -1 if leader.car_x > middle_lane - LANE_WIDTH else 0
+        game.update_game([(steer, 1), (0, -1)])
+        if trailer.game_state != "playing":
+            break
+    
+    assert leader.game_state == "playing"
+    assert trailer.game_state == "game_over"
+    assert leader.distance_traveled - trailer.distance_traveled > SCREEN_WIDTH
+
+
+def test_scripted_policies_see_their_own_car():
+    seen = {0: [], 1: []}
+    
+    def policy(player, steer):
+        def steer_and_watch(game):
+            seen[player].append(game.car_x)
+            return steer, 0
+        return steer_and_watch
+    
+    game = SplitScreenGame([ScriptedSource(policy(0, -1)), ScriptedSource(policy(1, 1))],
+                           headless=True, seed=1, record_results=False)
+    game.player_name = "Left, Right"
+    game.start_game()
+    for _ in range(20):
+        game.update_game()
+    
+    left, right = game.racers
+    assert left.car_x < SCREEN_WIDTH // 2 < right.car_x
+    # Each policy saw where its own car was before the step, not the shared starting position
+    assert seen[0][-1] == left.car_x + game.steer_sensitivity
+    assert seen[1][-1] == right.car_x - game.steer_sensitivity
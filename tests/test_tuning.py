@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from car_racing_game import (DEFAULT_TUNING, CarRacingGame, ScriptedSource, VectorRaceEnv, parse_tuning,
+                             resolve_tuning, run_batch, straight_policy)
+
+
+def test_values_take_their_defaults_type():
+    tuning = resolve_tuning({"hurdle_spacing": 400.0, "max_speed": 9, "min_speed": np.int64(2)})
+    assert tuning == dict(DEFAULT_TUNING, hurdle_spacing=400, max_speed=9.0, min_speed=2.0)
+    assert type(tuning["hurdle_spacing"]) is int
+    assert type(tuning["max_speed"]) is float
+
+
+@pytest.mark.parametrize("tuning", [
+    {"hurdle_spacing": 400.5},
+    {"hurdle_spacing": 0},
+    {"max_speed": "fast"},
+    {"max_speed": True},
+    {"min_speed": 9.0},
+    {"top_speed": 9.0},
+])
+def test_bad_values_are_rejected(tuning):
+    with pytest.raises(ValueError):
+        resolve_tuning(tuning)
+
+
+def test_float_spacing_works_everywhere():
+    tuning = {"hurdle_spacing": 700.0}
+    game = CarRacingGame(ScriptedSource(straight_policy), headless=True, seed=1, tuning=tuning,
+                         record_results=False)
+    assert game.run_headless()["steps"] > 0
+    env = VectorRaceEnv(2, tuning=tuning)
+    env.reset()
+    env.step(np.zeros((2, 2)))
+
+
+def test_batch_rejects_bad_tuning_before_starting_workers():
+    with pytest.raises(ValueError):
+        run_batch([0], ["scripted:straight"], tuning={"hurdle_spacing": 400.5})
+
+
+def test_command_line_tuning():
+    assert parse_tuning(["hurdle_spacing=500", "max_speed=8.5"]) == {"hurdle_spacing": 500, "max_speed": 8.5}
+    with pytest.raises(SystemExit):
+        parse_tuning(["hurdle_spacing=500.5"])
+    with pytest.raises(SystemExit):
+        parse_tuning(["max_speed=fast"])
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from car_racing_game import CarRacingGame, ScriptedSource, VectorRaceEnv, dodge_policy, straight_policy
+
+
+@pytest.mark.parametrize("tuning", [None, {"hurdle_spacing": 700, "max_speed": 8.5}])
+def test_vector_races_match_the_game(tuning):
+    num_races = 8
+    env = VectorRaceEnv(num_races, seed=5, tuning=tuning, auto_reset=False)
+    env.reset()
+    games = []
+    for seed in env.seeds:
+        game = CarRacingGame(ScriptedSource(straight_policy), headless=True, seed=int(seed), tuning=tuning,
+                             record_results=False)
+        game.player_name = "parity"
+        game.start_game()
+        games.append(game)
+    
+    # Half the races dodge, so some finish, the other half steer at random, so some crash
+    rng = np.random.default_rng(5)
+    outcomes = []
+    done = np.zeros(num_races, dtype=bool)
+    while not done.all():
+        actions = np.zeros((num_races, 2))
+        for race, game in enumerate(games):
+            if race % 2 == 0:
+                actions[race] = dodge_policy(game)
+            else:
+                actions[race] = rng.integers(-1, 2), rng.choice([-1.0, 0.5, 1.0])
+        _, _, dones, info = env.step(actions)
+        for race, game in enumerate(games):
+            if done[race]:
+                continue
+            game.step(tuple(actions[race]))
+            assert game.car_x == env.car_x[race]
+            assert game.car_speed == env.speed[race]
+            assert game.distance_traveled == env.distance[race]
+            assert (game.game_state == "game_over") == info["collided"][race]
+            assert (game.game_state == "finished") == info["finished"][race]
+            if dones[race]:
+                outcomes.append(game.game_state)
+        done |= dones
+    
+    assert set(outcomes) == {"game_over", "finished"}  # Both ways a race can end were compared
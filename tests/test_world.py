@@ -0,0 +1,43 @@
+import random
+
+import pygame
+import pytest
+
+from car_racing_game import House, Hurdle, Tree, WorldStore
+
+
+def brute_force_collides(world, layer, rect):
+    return any(pygame.Rect(x, y + world.scroll, w, h).colliderect(rect)
+               for x, y, w, h in zip(layer.x, layer.y, layer.w, layer.h))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_collides_matches_colliderect(seed):
+    rng = random.Random(seed)
+    world = WorldStore()
+    for layer, kind in zip(world.layers, (Tree, House, Hurdle)):
+        for _ in range(rng.randint(0, 60)):
+            if rng.random() < 0.3:
+                layer.add(rng.uniform(0, 1200), rng.uniform(-3000, 900), rng.randint(1, 120), rng.randint(1, 120))
+            else:
+                layer.add(rng.uniform(0, 1200), rng.uniform(-3000, 900))
+        # Adds after a read are folded in on the next one, ahead of or among the stored objects
+        len(layer.y)
+        layer.add(rng.uniform(0, 1200), rng.uniform(-3000, 900))
+    
+    for _ in range(200):
+        world.scroll = rng.choice([0.0, rng.uniform(0, 3000), float(rng.randint(0, 3000)) + 0.5])
+        rect = pygame.Rect(rng.uniform(0, 1200), rng.uniform(-100, 900), rng.randint(1, 150), rng.randint(1, 150))
+        for layer in world.layers:
+            assert world.collides(layer, rect) == brute_force_collides(world, layer, rect)
+
+
+def test_collides_on_exact_edges():
+    world = WorldStore()
+    world.hurdles.add(100, 200)
+    below = pygame.Rect(100, 200 + Hurdle.height, 10, 10)
+    beside = pygame.Rect(100 + Hurdle.width, 200, 10, 10)
+    assert not world.collides(world.hurdles, below)
+    assert not world.collides(world.hurdles, beside)
+    assert world.collides(world.hurdles, below.move(0, -1))
+    assert world.collides(world.hurdles, beside.move(-1, 0))